@@ -0,0 +1,123 @@
+import importlib
+import os
+import dd.cudd as cudd
+from functools import lru_cache
+from typing import Iterable, Optional
+
+BDD = cudd.BDD
+
+# 'cudd': CUDD through dd.cudd, with dynamic reordering and DDDMP snapshots
+# 'sylvan': Sylvan through dd.sylvan, which runs apply and quantification on several cores. The
+#   variable order is fixed when the variables are declared, and only one manager can exist in a
+#   process at a time.
+# 'autoref': the pure Python implementation of dd, slow but available without compiled bindings
+BACKENDS = ('cudd', 'sylvan', 'autoref')
+
+
+class Backend:
+    def __init__(self, name: str):
+        """The operations of a BDD package that are not methods of its manager or its BDDs.
+
+        Conjunction, negation, renaming with let and the like are the same in every dd module,
+        so the models use those directly. The relational products, the restriction to a care set
+        and moving variables to other levels are module functions that not every module has;
+        they are called through this class, which falls back to equivalent operations where a
+        module lacks them.
+
+        Args:
+            name (str): One of BACKENDS
+
+        Raises:
+            ValueError: Unknown backend
+            ImportError: The dd module of the backend is not installed (dd.cudd and dd.sylvan are
+            only available when dd is built with them)
+        """
+        if name not in BACKENDS:
+            raise ValueError(f'Unknown backend {name}, expected one of {BACKENDS}')
+        self.name = name
+        self.module = importlib.import_module(f'dd.{name}')
+
+    @property
+    def dynamic_reordering(self) -> bool:
+        """Whether the backend supports the reordering profiles and variable groups."""
+        return self.name == 'cudd'
+
+    @property
+    def static_order(self) -> bool:
+        """Whether variables stay at the level they are declared at."""
+        return self.name == 'sylvan'
+
+    @property
+    def snapshots(self) -> bool:
+        """Whether models on this backend can be written to snapshots (DDDMP files)."""
+        return self.name == 'cudd'
+
+    def manager(self, workers: Optional[int] = None) -> BDD:
+        """Creates a new BDD manager.
+
+        Args:
+            workers (Optional[int], optional): number of cores Sylvan may use. The Lace scheduler
+            of dd.sylvan starts a worker per available core, so the cores available to the whole
+            process are restricted to the first `workers`. Defaults to None, all cores.
+
+        Raises:
+            ValueError: workers is given for a backend that is not parallel
+
+        Returns:
+            BDD: the manager
+        """
+        if workers is not None:
+            if self.name != 'sylvan':
+                raise ValueError(f'The number of workers can only be set for sylvan, not for {self.name}')
+            os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:workers])
+        return self.module.BDD()
+
+    def and_exists(self, u: BDD, v: BDD, qvars: Iterable[str]) -> BDD:
+        """Returns the relational product: the variables `qvars` quantified existentially from
+        `u & v`, in one pass where the module supports it."""
+        if hasattr(self.module, 'and_exists'):
+            return self.module.and_exists(u, v, qvars)
+        return u.bdd.exist(qvars, u & v)
+
+    def or_forall(self, u: BDD, v: BDD, qvars: Iterable[str]) -> BDD:
+        """Returns the variables `qvars` quantified universally from `u | v`, in one pass where
+        the module supports it."""
+        if hasattr(self.module, 'or_forall'):
+            return self.module.or_forall(u, v, qvars)
+        return u.bdd.forall(qvars, u | v)
+
+    def restrict(self, u: BDD, care_set: BDD) -> BDD:
+        """Returns a BDD that equals `u` on the care set and is as small as the module can make it
+        elsewhere. Without a restrict operation `u` itself is returned, which is a valid (if not
+        smaller) result."""
+        if hasattr(self.module, 'restrict'):
+            return self.module.restrict(u, care_set)
+        return u
+
+    def reorder(self, bdd: BDD, levels: dict[str, int]) -> None:
+        """Moves the variables of the manager to the given levels.
+
+        Raises:
+            ValueError: The backend has a static variable order
+        """
+        if self.static_order:
+            raise ValueError(f'The variables of a {self.name} manager cannot be moved after they are declared')
+        self.module.reorder(bdd, levels)
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: str) -> Backend:
+    """Returns the Backend with the given name, every backend is created once."""
+    return Backend(name)
+
+
+def backend_of(bdd: BDD) -> Backend:
+    """Returns the Backend a BDD manager belongs to.
+
+    Args:
+        bdd (BDD): a manager created by one of the BACKENDS
+
+    Returns:
+        Backend: the backend
+    """
+    return get_backend(type(bdd).__module__.rsplit('.', 1)[-1])
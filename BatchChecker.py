@@ -0,0 +1,181 @@
+import argparse
+import copy
+import multiprocessing
+import os
+import resource
+import tempfile
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from time import perf_counter
+from typing import Optional
+
+# seconds between checks for timed out workers while waiting for results
+POLL_INTERVAL = 0.1
+
+
+def check_formula(model, test: str, args: argparse.Namespace) -> dict:
+    """Checks one formula the way main.output does, but returns the outcome instead of printing
+    it.
+
+    Args:
+        model (Union[SymbolicModel, ExplicitSymbolicModel]): the model
+        test (str): PDL formula
+        args (argparse.Namespace): the command line arguments
+
+    Returns:
+        dict: the kind of result ('vector', 'state' or 'file') and the result itself
+    """
+    from main import output_bdd_file_name
+
+    if args.explicit:
+        return {'kind': 'vector', 'result': model.check(test)}
+    if args.state:
+        return {'kind': 'state', 'result': model.check(test, state_valuation=args.state)}
+    file_name = output_bdd_file_name(test, args)
+    model.check(test, print_bdd_filename=file_name)
+    return {'kind': 'file', 'result': file_name}
+
+
+def worker(args: argparse.Namespace, connection: Connection, memory_limit: Optional[int]) -> None:
+    """Loads the model once and checks the formulas the parent sends until it receives None.
+
+    Args:
+        args (argparse.Namespace): the command line arguments, used to load the model
+        connection (Connection): pipe to the parent, which sends (index, formula) pairs or None
+        memory_limit (Optional[int]): address space limit of the worker in bytes
+    """
+    from main import load_model
+
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    model = load_model(args)
+    connection.send(('ready',))
+    while True:
+        task = connection.recv()
+        if task is None:
+            return
+        index, test = task
+        t0 = perf_counter()
+        try:
+            outcome = check_formula(model, test, args)
+            connection.send(('done', outcome, perf_counter() - t0))
+        except Exception as e:
+            connection.send(('error', f'{type(e).__name__}: {e}', perf_counter() - t0))
+
+
+class BatchChecker:
+    def __init__(self, args: argparse.Namespace, jobs: int, timeout: Optional[float] = None,
+                 memory_limit: Optional[int] = None):
+        """Checks a batch of formulas in worker processes.
+
+        Every worker loads the model once. Symbolic models on the cudd backend are loaded from a
+        snapshot (the one given on the command line, or a temporary one written by the parent), 
+        so the workers do not parse the input file. A worker that crashes, runs out of memory or exceeds the timeout
+        only fails the formula it was checking; it is replaced by a new worker.
+
+        Args:
+            args (argparse.Namespace): the command line arguments
+            jobs (int): number of worker processes
+            timeout (Optional[float], optional): maximum number of seconds per formula. Defaults to
+            None, no limit.
+            memory_limit (Optional[int], optional): address space limit per worker in bytes.
+            Defaults to None, no limit.
+        """
+        self.args = args
+        self.jobs = jobs
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.context = multiprocessing.get_context('spawn')
+
+    def run(self, model, tests: list[str]):
+        """Checks the formulas and yields their outcomes in the order of the tests.
+
+        Args:
+            model (Union[SymbolicModel, ExplicitSymbolicModel]): the model loaded by the parent,
+            used to write a snapshot for the workers
+            tests (list[str]): PDL formulas
+
+        Yields:
+            Iterator[tuple[str, dict]]: per formula the formula and its outcome, a dict with the
+            status ('done', 'error' or 'crashed'), the time and the result or error message
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            worker_args = copy.copy(self.args)
+            if not self.args.explicit and not self.args.snapshot and model.backend.snapshots:
+                worker_args.snapshot = os.path.join(directory, 'model.json')
+                model.save_snapshot(worker_args.snapshot, self.args.file)
+            yield from self._run(worker_args, tests)
+
+    def _run(self, worker_args: argparse.Namespace, tests: list[str]):
+        # the parent hands out the formulas one at a time, so it always knows which formula a
+        # worker was checking when it died
+        pending = deque(range(len(tests)))
+        workers = {}
+        outcomes = {}
+        next_to_yield = 0
+
+        def start_worker():
+            parent_connection, child_connection = self.context.Pipe()
+            process = self.context.Process(target=worker, args=(worker_args, child_connection, self.memory_limit),
+                                           daemon=True)
+            process.start()
+            child_connection.close()
+            workers[parent_connection] = {'process': process, 'index': None, 'started': None}
+
+        def assign(connection):
+            state = workers[connection]
+            if pending:
+                state['index'], state['started'] = pending.popleft(), perf_counter()
+                connection.send((state['index'], tests[state['index']]))
+            else:
+                connection.send(None)
+                del workers[connection]
+
+        def fail(connection, error):
+            state = workers.pop(connection)
+            state['process'].kill()
+            state['process'].join()
+            if state['index'] is None:
+                # a worker that died while loading the model would die again
+                return
+            outcomes[state['index']] = {'status': 'crashed', 'error': error, 'time': perf_counter() - state['started']}
+            if pending:
+                start_worker()
+
+        for _ in range(min(self.jobs, len(tests))):
+            start_worker()
+
+        try:
+            while next_to_yield < len(tests):
+                if not workers:
+                    raise RuntimeError('All workers exited before the batch was finished, the model could not be '
+                                       'loaded (is the memory limit too low?)')
+
+                for connection in wait(list(workers), timeout=POLL_INTERVAL):
+                    try:
+                        message = connection.recv()
+                    except EOFError:
+                        fail(connection, f"worker exited with code {workers[connection]['process'].exitcode}")
+                        continue
+
+                    index = workers[connection]['index']
+                    if message[0] == 'done':
+                        outcomes[index] = {'status': 'done', **message[1], 'time': message[2]}
+                    elif message[0] == 'error':
+                        outcomes[index] = {'status': 'error', 'error': message[1], 'time': message[2]}
+                    assign(connection)
+
+                if self.timeout is not None:
+                    now = perf_counter()
+                    for connection, state in list(workers.items()):
+                        if state['index'] is not None and now - state['started'] > self.timeout:
+                            fail(connection, f'timeout after {self.timeout} seconds')
+
+                while next_to_yield in outcomes:
+                    yield tests[next_to_yield], outcomes.pop(next_to_yield)
+                    next_to_yield += 1
+        finally:
+            for connection, state in workers.items():
+                state['process'].kill()
+                state['process'].join()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import struct
+import numpy as np
+from typing import Iterable, NamedTuple, Union
+from MatrixInputToModel import Edges, SymbolicModelFromMatrix
+
+# layout of a binary model file:
+# - the fixed header: magic, format version and the length of the metadata
+# - the metadata as JSON: names, tests and the offset, dtype and shape of every array
+# - the arrays, every array starting at a multiple of ALIGNMENT bytes
+MAGIC = b'PDLMODEL'
+VERSION = 1
+FIXED_HEADER = struct.Struct('<8sIQ')
+ALIGNMENT = 64
+
+
+class CSRProgram(NamedTuple):
+    """A program in compressed sparse row form: the targets of state i are
+    indices[indptr[i]:indptr[i + 1]]."""
+    indptr: np.ndarray
+    indices: np.ndarray
+
+
+def is_binary_model(file: str) -> bool:
+    """Checks if a file is a binary model file by its magic bytes.
+
+    Args:
+        file (str): path to the file
+
+    Returns:
+        bool: True if the file starts with the binary model magic
+    """
+    with open(file, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def edges_to_csr(num_states: int, program: Union[np.ndarray, Edges, Iterable[Edges]]) -> CSRProgram:
+    """Converts a program as given to ExplicitSymbolicModel to compressed sparse row form.
+
+    Args:
+        num_states (int): number of states in the model
+        program (Union[np.ndarray, Edges, Iterable[Edges]]): a transition matrix, a pair of
+        source and target index arrays or an iterable of such pairs
+
+    Returns:
+        CSRProgram: the program with the targets of every state sorted
+    """
+    if isinstance(program, np.ndarray):
+        chunks = [np.nonzero(program)]
+    elif isinstance(program, tuple):
+        chunks = [program]
+    else:
+        chunks = list(program)
+
+    sources = np.concatenate([np.asarray(chunk[0], dtype=np.int64) for chunk in chunks] or [np.empty(0, np.int64)])
+    targets = np.concatenate([np.asarray(chunk[1], dtype=np.int64) for chunk in chunks] or [np.empty(0, np.int64)])
+
+    if sources.size and max(sources.max(), targets.max()) >= num_states:
+        raise ValueError("Number of states in the program and in the model don't match")
+
+    order = np.lexsort((targets, sources))
+    index_dtype = np.uint32 if num_states <= np.iinfo(np.uint32).max else np.int64
+    indptr = np.zeros(num_states + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_states), out=indptr[1:])
+    return CSRProgram(indptr, targets[order].astype(index_dtype))
+
+
+def write_binary_model(file: str, num_states: int, valuations: list[list[int]], proposition_names: list[str],
+                       programs: list[Union[np.ndarray, Edges, Iterable[Edges]]], program_names: list[str],
+                       tests: list[str]) -> None:
+    """Writes an explicit model in the binary format. The valuations are stored as a bit packed
+    matrix with a row per proposition, every program as a CSR adjacency structure.
+
+    Args:
+        file (str): path of the binary model file
+        num_states (int): number of states
+        valuations (list[list[int]]): valuation of every proposition in every state
+        proposition_names (list[str]): names of the propositions
+        programs (list[Union[np.ndarray, Edges, Iterable[Edges]]]): the programs, in any form
+        accepted by ExplicitSymbolicModel
+        program_names (list[str]): names of the programs
+        tests (list[str]): PDL formulas stored with the model
+    """
+    valuation_matrix = np.asarray(valuations, dtype=bool).reshape(len(proposition_names), num_states)
+    arrays = {'valuations': np.packbits(valuation_matrix, axis=1, bitorder='little')}
+    for index, program in enumerate(programs):
+        csr = edges_to_csr(num_states, program)
+        arrays[f'indptr_{index}'] = csr.indptr
+        arrays[f'indices_{index}'] = csr.indices
+
+    # the metadata has to be written before the arrays, but contains their offsets, so the
+    # offsets are relative to the (aligned) end of the metadata
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': array.shape}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    metadata = json.dumps({
+        'num_states': num_states,
+        'proposition_names': proposition_names,
+        'program_names': program_names,
+        'tests': tests,
+        'arrays': layout,
+    }).encode()
+
+    with open(file, 'wb') as f:
+        f.write(FIXED_HEADER.pack(MAGIC, VERSION, len(metadata)))
+        f.write(metadata)
+        data_start = -(-f.tell() // ALIGNMENT) * ALIGNMENT
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_binary_model(file: str) -> tuple[int, np.ndarray, list[str], list[CSRProgram], list[str], list[str]]:
+    """Opens a binary model file. The arrays are memory mapped, so only the slices that are used
+    are read from disk.
+
+    Args:
+        file (str): path of the binary model file
+
+    Raises:
+        ValueError: the file is not a binary model file, or has an unsupported version
+
+    Returns:
+        tuple[int, np.ndarray, list[str], list[CSRProgram], list[str], list[str]]: number of
+        states, the unpacked valuation matrix, proposition names, programs, program names and
+        tests
+    """
+    with open(file, 'rb') as f:
+        magic, version, metadata_length = FIXED_HEADER.unpack(f.read(FIXED_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"'{file}' is not a binary model file")
+        if version != VERSION:
+            raise ValueError(f"Binary model version {version} is not supported (expected {VERSION})")
+        metadata = json.loads(f.read(metadata_length))
+        data_start = -(-f.tell() // ALIGNMENT) * ALIGNMENT
+
+    def open_array(name: str) -> np.ndarray:
+        layout = metadata['arrays'][name]
+        shape = tuple(layout['shape'])
+        if 0 in shape:
+            return np.empty(shape, dtype=layout['dtype'])
+        return np.memmap(file, dtype=layout['dtype'], mode='r', offset=data_start + layout['offset'], shape=shape)
+
+    num_states = metadata['num_states']
+    valuations = np.unpackbits(open_array('valuations'), axis=1, count=num_states, bitorder='little')
+    programs = [CSRProgram(open_array(f'indptr_{index}'), open_array(f'indices_{index}'))
+                for index in range(len(metadata['program_names']))]
+
+    return num_states, valuations, metadata['proposition_names'], programs, metadata['program_names'], metadata['tests']
+
+
+def convert(text_file: str, binary_file: str) -> None:
+    """Converts an explicit model from the text format to the binary format.
+
+    Args:
+        text_file (str): path of the model in the text format of MatrixInputToModel
+        binary_file (str): path of the binary model file to write
+    """
+    write_binary_model(binary_file, *SymbolicModelFromMatrix(text_file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert an explicit model from the text format to the binary format')
+    parser.add_argument('text_file', type=str, help='model in the text format (optionally gzipped)')
+    parser.add_argument('binary_file', type=str, help='path of the binary model file')
+    args = parser.parse_args()
+    convert(args.text_file, args.binary_file)
+
+
+if __name__ == '__main__':
+    main()
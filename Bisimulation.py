@@ -0,0 +1,225 @@
+import dd.cudd as cudd
+from PartitionedProgram import PartitionedProgram
+
+from time import perf_counter
+from typing import Iterable, Optional
+
+BDD = cudd.BDD
+
+
+class Quotient:
+    def __init__(self, model, quotient, observables: frozenset[str], block_map: BDD, report: dict):
+        """A model divided by a bisimulation, with the maps between their states.
+
+        Every block of bisimilar states is represented by one of its states, the quotient model
+        contains the representatives and the transitions between them. A formula over the
+        observed propositions has the same value in a state as in its representative, so it is
+        checked on the quotient and the result is lifted back to the states of the model.
+
+        Args:
+            model (SymbolicModel): the minimized model
+            quotient (SymbolicModel): the quotient model, over the same variables
+            observables (frozenset[str]): the propositions the bisimulation preserves
+            block_map (BDD): relation from every state (unprimed variables) to the representative
+            of its block (temporary variables)
+            report (dict): the statistics of the minimization, see BisimulationMinimizer.minimize
+        """
+        self.model = model
+        self.quotient = quotient
+        self.observables = observables
+        self.block_map = block_map
+        self.report = report
+
+    def evaluate(self, PDL_expression: str) -> BDD:
+        """Evaluates a formula on the quotient and returns the states of the model where it holds.
+
+        Args:
+            PDL_expression (str): A PDL formula over the observed propositions
+
+        Raises:
+            ValueError: The formula uses a proposition that is not observed, the bisimulation does
+            not preserve it
+
+        Returns:
+            BDD: the states of the model where the formula holds, within its law
+        """
+        propositions = self.quotient.transformer.compile(PDL_expression).propositions
+        if not propositions <= self.observables:
+            raise ValueError(f'The propositions {sorted(propositions - self.observables)} are not preserved by the '
+                             f'minimization, minimize over them as well')
+        return self.lift(self.quotient.transformer.evaluate_expression(PDL_expression))
+
+    def lift(self, states: BDD) -> BDD:
+        """Returns the states of the model whose representative is in the given states of the
+        quotient."""
+        registry = self.model.registry
+        representatives = registry.rename(states, registry.unprimed_to_temporary)
+        return self.model.backend.and_exists(self.block_map, representatives, registry.temporary_variables)
+
+    def check(self, PDL_expression: str, state_valuation: Optional[str] = None, print_bdd_filename: Optional[str] = None) -> Optional[bool]:
+        """Evaluates a PDL formula on the quotient, like SymbolicModel.check.
+
+        Args:
+            PDL_expression (str): A PDL formula over the observed propositions
+            state_valuation (Optional[str], optional): A Boolean expression describing the
+            valuation of a state of the model. Defaults to None.
+            print_bdd_filename (Optional[str], optional): file the lifted result is written to.
+            Defaults to None.
+
+        Raises:
+            ValueError: State doesn't exist in the model, or the formula uses a proposition that
+            is not observed
+
+        Returns:
+            Optional[bool]: If a state is provided, whether the formula holds in that state
+        """
+        states_where_true = self.evaluate(PDL_expression)
+        bdd = self.model.bdd
+        if state_valuation:
+            state_valuation_bdd = bdd.add_expr(state_valuation)
+            if bdd.apply('->', state_valuation_bdd, self.model.law) == bdd.true:
+                return bdd.apply('->', state_valuation_bdd, states_where_true) == bdd.true
+            raise ValueError('State not found in model')
+        if print_bdd_filename:
+            bdd.dump(print_bdd_filename, roots=[states_where_true])
+
+    def file_tests(self) -> Optional[list[str]]:
+        return self.model.file_tests()
+
+
+class BisimulationMinimizer:
+    def __init__(self, model):
+        """Computes the coarsest bisimulation of a symbolic model with symbolic partition
+        refinement, and its quotient.
+
+        The bisimulation is kept as an equivalence relation E(s, u) between the states of the law,
+        over the unprimed (s) and temporary (u) copies of the variables. It starts with the states
+        that agree on the observed propositions and is refined until it is stable: two states
+        stay equivalent when, for every program, they reach the same blocks. The blocks a state s
+        reaches are the preimage of the relation, <a>E(s, u) with u as a parameter, so refining
+        only needs the transformer's preimage and the primed copy for the second state.
+
+        Args:
+            model (SymbolicModel): the model
+        """
+        self.model = model
+        self.bdd = model.bdd
+        self.registry = model.registry
+        registry = self.registry
+        self.temporary_to_primed = {temporary: primed for primed, temporary in registry.primed_to_temporary.items()}
+        # s -> u and u -> w' at once, the second state of a pair becomes the first
+        self.shift = {**registry.unprimed_to_temporary, **self.temporary_to_primed}
+        self.temporary_to_unprimed = {temporary: var for var, temporary in registry.unprimed_to_temporary.items()}
+        # s <-> u, the relations are symmetric in the two states of a pair
+        self.swap = {**registry.unprimed_to_temporary, **self.temporary_to_unprimed}
+
+    def minimize(self, propositions: Optional[Iterable[str]] = None) -> Quotient:
+        """Divides the model by its coarsest bisimulation over the propositions and all programs.
+
+        A state of a symbolic model is its valuation, so when every proposition is observed no
+        two states are bisimilar. Observing only the propositions that the formulas use lets the
+        hidden ones (such as counters or encodings of the state) be merged.
+
+        Args:
+            propositions (Optional[Iterable[str]], optional): the observed propositions. Defaults
+            to None, all variables.
+
+        Raises:
+            ValueError: A proposition is not a variable of the model
+
+        Returns:
+            Quotient: the quotient model with the block map, its report contains the number of
+            states and blocks, their ratio, the number of refinement rounds, the time, and the
+            nodes of the law, the programs and the equivalence
+        """
+        model = self.model
+        registry = self.registry
+        observables = registry.unprimed_variables if propositions is None else frozenset(propositions)
+        unknown = observables - registry.unprimed_variables
+        if unknown:
+            raise ValueError(f'Propositions {sorted(unknown)} are not variables of the model')
+
+        t0 = perf_counter()
+        equivalence, rounds = self.equivalence(observables)
+        block_map = self.representatives(equivalence)
+        representatives = registry.rename(self.bdd.exist(registry.unprimed_variables, block_map),
+                                          self.temporary_to_unprimed)
+
+        programs = {}
+        for name, program in model.programs.items():
+            # the transitions of a representative, with the targets mapped to their representative
+            relation = model.transformer._preimage(program, block_map) & representatives
+            programs[name] = PartitionedProgram.wrap(self.bdd, registry.rename(relation, self.temporary_to_primed))
+        quotient = type(model)(self.bdd, list(model.variables), representatives, programs, model.tests,
+                               variable_order=None, cluster_nodes=model.cluster_nodes)
+        quotient.transformer.star_strategy = model.transformer.star_strategy
+
+        num_vars = len(model.variables)
+        states, blocks = self.bdd.count(model.law, nvars=num_vars), self.bdd.count(representatives, nvars=num_vars)
+        report = {'states': states, 'blocks': blocks, 'ratio': states / blocks if blocks else 1.0, 'rounds': rounds,
+                  'time': perf_counter() - t0, 'observables': sorted(observables),
+                  'law_nodes_before': len(model.law), 'law_nodes_after': len(representatives),
+                  'program_nodes_before': sum(len(program) for program in model.programs.values()),
+                  'program_nodes_after': sum(len(program) for program in quotient.programs.values()),
+                  'equivalence_nodes': len(equivalence), 'block_map_nodes': len(block_map)}
+        return Quotient(model, quotient, observables, block_map, report)
+
+    def equivalence(self, observables: frozenset[str]) -> tuple[BDD, int]:
+        """Returns the coarsest bisimulation over the observed propositions.
+
+        Args:
+            observables (frozenset[str]): the observed propositions
+
+        Returns:
+            tuple[BDD, int]: the bisimulation E(s, u), and the number of refinement rounds
+        """
+        model = self.model
+        registry = self.registry
+        law_u = registry.rename(model.law, registry.unprimed_to_temporary)
+        equivalence = model.law & law_u
+        for var in observables:
+            equivalence &= self.bdd.apply('<->', self.bdd.var(var), self.bdd.var(registry.unprimed_to_temporary[var]))
+
+        rounds = 0
+        while True:
+            rounds += 1
+            refined = equivalence
+            for program in model.programs.values():
+                refined &= ~self._distinguished(program, equivalence)
+            if refined == equivalence:
+                return equivalence, rounds
+            equivalence = refined
+
+    def _distinguished(self, program: PartitionedProgram, equivalence: BDD) -> BDD:
+        """Returns the pairs (s, u) where one state reaches a block with the program that the
+        other state does not reach."""
+        registry = self.registry
+        # s reaches the block of u
+        reaches = self.model.transformer._preimage(program, equivalence)
+        # s reaches the block of w' and u does not, without building the relation over the three
+        # copies; the pairs where u reaches a block that s does not are the same pairs swapped
+        first = registry.rename(reaches, self.temporary_to_primed)
+        second = registry.rename(reaches, self.shift)
+        one_sided = self.model.backend.and_exists(first, ~second, registry.primed_variables)
+        return one_sided | registry.rename(one_sided, self.swap)
+
+    def representatives(self, equivalence: BDD) -> BDD:
+        """Maps every state to the least state of its block, in the order of the variables (false
+        before true).
+
+        Args:
+            equivalence (BDD): the bisimulation E(s, u)
+
+        Returns:
+            BDD: the block map, the function from s to the representative u
+        """
+        registry = self.registry
+        block_map = equivalence
+        later = set(registry.temporary_variables)
+        for var in registry.variables:
+            temporary = registry.unprimed_to_temporary[var]
+            later.discard(temporary)
+            # the states whose block still has a member with this variable false
+            can_be_false = self.bdd.exist(later, self.bdd.let({temporary: self.bdd.false}, block_map))
+            block_map &= ~can_be_false | ~self.bdd.var(temporary)
+        return block_map
@@ -0,0 +1,156 @@
+import dd.cudd as cudd
+import weakref
+from PartitionedProgram import Modified, PartitionedProgram, frame_condition
+from QueryPlan import PlanNode
+
+from typing import Iterable
+
+BDD = cudd.BDD
+# the programs of a formula and the variables of their cone
+InfluenceSet = tuple[frozenset[str], frozenset[str]]
+
+
+class ConeOfInfluence:
+    def __init__(self, model):
+        """Reduces a symbolic model to the part that can influence a formula.
+
+        The cone of a formula starts with its propositions. A program of the formula is projected
+        onto the cone: the variables outside it are quantified away, from the source states
+        (within the law) and from the target states. The projection is exact when the cone
+        states a program can reach from a state only depend on the cone variables of that state
+        (given the law). If they also depend on other variables, for instance the guard of a
+        transition or a variable that the law ties to a target, those variables join the cone
+        and the programs are projected again.
+
+        With exact projections every formula over the cone has the same value in a state of the
+        model as in its projection, so the formula is checked on a smaller model with the
+        projected law (the cone states that occur in the law) and programs. Reduced models are
+        kept per influence set, the programs of the formula and the variables of its cone, so
+        formulas over the same programs and propositions reuse the reduction. When the cone
+        contains every variable the model itself is used.
+
+        Args:
+            model (SymbolicModel): the model that is reduced
+        """
+        # the model owns its cones, a weak reference avoids a reference cycle (see PDLTransformer)
+        self.model = weakref.proxy(model)
+        self.model_class = type(model)
+        # per programs and propositions of a formula, its influence set
+        self.cones = {}
+        # per influence set, the reduced model or None when the cone is the whole model
+        self.reductions = {}
+
+    def reduce(self, plan: PlanNode):
+        """Returns the model reduced to the cone of influence of a formula.
+
+        Args:
+            plan (PlanNode): the compiled formula
+
+        Returns:
+            Optional[SymbolicModel]: the reduced model, or None when the formula is checked on the
+            model itself (the formula has no modalities, its cone contains every variable, or it
+            uses names that are not in the model, which the evaluation reports)
+        """
+        model = self.model
+        if not plan.programs or not plan.programs <= model.programs.keys():
+            return None
+        if not plan.propositions <= model.registry.unprimed_variables:
+            return None
+
+        key = (plan.programs, plan.propositions)
+        if key not in self.cones:
+            cone, programs = self._grow(plan.programs, plan.propositions)
+            influence: InfluenceSet = (plan.programs, cone)
+            self.cones[key] = influence
+            if influence not in self.reductions:
+                self.reductions[influence] = self._reduced_model(cone, programs)
+        return self.reductions[self.cones[key]]
+
+    def invalidate(self, programs: Iterable[str] = (), law: bool = False) -> None:
+        """Forgets the reductions that use a changed program, or all of them when the law changed.
+
+        Args:
+            programs (Iterable[str], optional): names of the changed programs. Defaults to ().
+            law (bool, optional): the law changed. Defaults to False.
+        """
+        names = frozenset(programs)
+        for key, influence in list(self.cones.items()):
+            if law or influence[0] & names:
+                del self.cones[key]
+                self.reductions.pop(influence, None)
+
+    def _grow(self, program_names: frozenset[str], propositions: frozenset[str]) -> tuple[frozenset[str], dict[str, PartitionedProgram]]:
+        """Grows the cone from the propositions until every program projects exactly onto it.
+
+        Args:
+            program_names (frozenset[str]): the programs of the formula
+            propositions (frozenset[str]): the propositions of the formula
+
+        Returns:
+            tuple[frozenset[str], dict[str, PartitionedProgram]]: the cone and the programs
+            projected onto it
+        """
+        model = self.model
+        registry = model.registry
+        cone = frozenset(propositions)
+        while True:
+            rest = registry.unprimed_variables - cone
+            targets = {}
+            added = set()
+            projections = {}
+            for name in sorted(program_names):
+                program = model.programs[name]
+                relation = projected_relation = model.bdd.false
+                clusters, modified = [], []
+                for cluster, cluster_modified in zip(program.clusters, program.modified):
+                    image, frame = self._image(cluster, cluster_modified, cone, targets)
+                    projection = model.bdd.exist(rest, model.law & image)
+                    relation |= frame & image
+                    projected_relation |= frame & projection
+                    clusters.append(projection)
+                    modified.append(None if cluster_modified is None else cluster_modified & cone)
+                if model.law & relation != model.law & projected_relation:
+                    added |= rest & model.bdd.support(relation)
+                projections[name] = PartitionedProgram(model.bdd, clusters, modified)
+            if not added:
+                return cone, projections
+            cone |= added
+
+    def _image(self, cluster: BDD, modified: Modified, cone: frozenset[str], targets: dict) -> tuple[BDD, BDD]:
+        """Returns the transitions of a cluster to target states in the law, with the primed
+        variables outside the cone quantified away, and the frame condition of the unmodified
+        cone variables for a framed cluster (which is not conjoined to the image).
+
+        Args:
+            cluster (BDD): cluster of a program
+            modified (Modified): the variables the cluster modifies, or None
+            cone (frozenset[str]): the current cone
+            targets (dict): the primed law per set of modified variables, with the unmodified
+            variables replaced by their unprimed copy
+
+        Returns:
+            tuple[BDD, BDD]: the image and the frame condition
+        """
+        model = self.model
+        registry = model.registry
+        if modified is None:
+            quantified = frozenset(registry.prime_map[var] for var in registry.unprimed_variables - cone)
+            return model.backend.and_exists(cluster, model.primed_law, quantified), model.bdd.true
+
+        if modified not in targets:
+            unchanged = {registry.prime_map[var]: var for var in registry.unprimed_variables - modified}
+            targets[modified] = registry.rename(model.primed_law, unchanged)
+        quantified = frozenset(registry.prime_map[var] for var in modified - cone)
+        image = model.backend.and_exists(cluster, targets[modified], quantified)
+        return image, frame_condition(model.bdd, cone - modified)
+
+    def _reduced_model(self, cone: frozenset[str], programs: dict[str, PartitionedProgram]):
+        model = self.model
+        if cone == model.registry.unprimed_variables:
+            return None
+        variables = [var for var in model.variables if var in cone]
+        law = model.bdd.exist(model.registry.unprimed_variables - cone, model.law)
+        reduced = self.model_class(model.bdd, variables, law, programs, programs_restricted=True,
+                                   variable_order=None, cluster_nodes=model.cluster_nodes)
+        reduced.transformer.star_strategy = model.transformer.star_strategy
+        return reduced
@@ -1,15 +1,47 @@
 import numpy as np
 import dd.cudd as cudd
-from typing import Optional, Union
-from MatrixInputToModel import SymbolicModelFromMatrix
+from typing import Iterable, Optional, Union
+from VariableRegistry import VariableRegistry
+from Reordering import ReorderingControl
+from MatrixInputToModel import CHUNK_SIZE, Edges, SymbolicModelFromMatrix
+from BinaryModel import CSRProgram, is_binary_model, read_binary_model
+from PartitionedProgram import CLUSTER_NODES, PartitionedProgram
+from Witness import Witness, WitnessExtractor
 import random
 
 BDD = cudd.BDD
 
+
+def balanced_disjunction(bdd: cudd.BDD, terms: list[BDD]) -> BDD:
+    """Returns the disjunction of the terms, computed as a balanced tree of pairwise disjunctions.
+
+    Neighbouring terms are combined first, so when the terms are sorted on their state codes 
+    every disjunction merges two BDDs of similar size with shared prefixes, instead of adding one
+    small term to an ever growing BDD.
+
+    Args:
+        bdd (cudd.BDD): BDD manager of the terms
+        terms (list[BDD]): boolean expressions to combine
+
+    Returns:
+        BDD: the disjunction of all terms
+    """    
+    if not terms:
+        return bdd.false
+    while len(terms) > 1:
+        paired = [terms[i] | terms[i + 1] for i in range(0, len(terms) - 1, 2)]
+        if len(terms) % 2:
+            paired.append(terms[-1])
+        terms = paired
+    return terms[0]
+
+
 class ExplicitSymbolicModel:
     def __init__(self, num_states: int, valuations: list[list[int]], proposition_names: list[str],
-                                        programs: list[np.ndarray], program_names: list[str],
-                                        tests: Optional[list[str]]=None):
+                                        programs: list[Union[np.ndarray, Edges, Iterable[Edges], CSRProgram]], program_names: list[str],
+                                        tests: Optional[list[str]]=None, variable_order: Union[str, list[str]] = 'interleaved',
+                                        reordering: Optional[str] = None, reordering_options: Optional[dict] = None,
+                                        cluster_nodes: Optional[int] = CLUSTER_NODES):
         """Creates a symbolically represented kripke model.
 
         Contains
@@ -25,11 +57,26 @@ class ExplicitSymbolicModel:
             outer list is the amount of propositions, length of inner list must match the number of
             states. 
             proposition_names (list[str]): Names of the propositions as matched to the valuations list.
-            programs (list[np.ndarray]): List of programs in explicit matrix notation. 
+            programs (list[Union[np.ndarray, Edges, Iterable[Edges], CSRProgram]]): List of 
+            programs, either in explicit matrix notation, as a pair of arrays with the source and
+            target state indices of every transition, as an iterable over chunks of such pairs, or
+            in compressed sparse row form.
             program_names (list[str]): List of program names as matched to the programs list.
+            variable_order (Union[str, list[str]], optional): Variable ordering policy, one of 
+            VARIABLE_ORDERS or an order of the propositions. Every state is a full cube, so the 
+            'dependency' order has no dependencies to go on and keeps the given order. Defaults to
+            'interleaved'.
+            reordering (Optional[str], optional): Dynamic reordering profile after construction, 
+            one of REORDERING_PROFILES, or None to keep the setting of the BDD manager. Defaults 
+            to None.
+            reordering_options (Optional[dict], optional): Keyword arguments for the 
+            ReorderingControl (threshold, max_growth, max_swaps, max_vars). Defaults to None.
+            cluster_nodes (Optional[int], optional): Maximum number of nodes of a cluster of a 
+            program, see PartitionedProgram.from_transitions. Defaults to CLUSTER_NODES.
         """        
         
         self._num_states = num_states
+        self.cluster_nodes = cluster_nodes
         self._current_prop_number = 0
         self.prop_names = proposition_names
 
@@ -39,25 +86,40 @@ class ExplicitSymbolicModel:
         self.programs = {}
         self.tests = tests
 
+        self.registry = VariableRegistry(self.bdd, self.prop_names, variable_order)
         self.states = []
+        self.primed_states = []
+
+        # the states and transitions are combined in an order that keeps the intermediate BDDs 
+        # small, dynamic reordering during this bulk construction would only cost time, so the 
+        # reordering profile only starts once the model is complete
+        self.reordering = ReorderingControl(self.bdd, reordering, **(reordering_options or {}))
+        self.reordering.group(self.registry.variable_groups())
+
         self.valuate_states(valuations)
 
         # self._make_states_unique()
 
         self.law = self._construct_law_expression()
+        self.primed_law = self._add_primes(self.law)
         
         for program, name in zip(programs, program_names):
             self._add_program(program, name)
 
-        
-
         from Parser import PDLTransformer 
         self.transformer = PDLTransformer(self)
 
+        self.reordering.start()
+
     @classmethod
-    def from_file(cls, file_name: str) -> "SymbolicModel":
-        num_states, valuations, valuation_names, programs, program_names, tests = SymbolicModelFromMatrix(file_name)
-        return cls(num_states, valuations, valuation_names, programs, program_names, tests) 
+    def from_file(cls, file_name: str, variable_order: Union[str, list[str]] = 'interleaved', reordering: Optional[str] = None,
+                  reordering_options: Optional[dict] = None, cluster_nodes: Optional[int] = CLUSTER_NODES) -> "SymbolicModel":
+        if is_binary_model(file_name):
+            num_states, valuations, valuation_names, programs, program_names, tests = read_binary_model(file_name)
+        else:
+            num_states, valuations, valuation_names, programs, program_names, tests = SymbolicModelFromMatrix(file_name)
+        return cls(num_states, valuations, valuation_names, programs, program_names, tests, variable_order,
+                   reordering, reordering_options, cluster_nodes) 
     
     def __enter__(self):
         return self
@@ -67,6 +129,7 @@ class ExplicitSymbolicModel:
 
     def _release_bdd_references(self):
         self.law = None
+        self.primed_law = None
         self.programs.clear()
         self.bdd = None
         self.transformer = None    
@@ -80,14 +143,7 @@ class ExplicitSymbolicModel:
         Returns:
             BDD: the same expression with primes added to the variables
         """        
-        primed_name_map = {var: var + "'" for var in self.bdd.support(expression)}
-        for v in primed_name_map.values():
-            self.bdd.declare(v)
-            
-        if primed_name_map:
-            return self.bdd.let(primed_name_map, expression)
-        else:
-            return expression
+        return self.registry.rename(expression, self.registry.prime_map)
     
     def _add_temporary(self, expression: BDD, is_primed: bool) -> BDD:
         """Adds temporary suffix 'T' to all variables in the expression.
@@ -102,21 +158,9 @@ class ExplicitSymbolicModel:
         Returns:
             BDD: same boolean expression as input with T suffix added
         """        
-        remapping = {}
-        for var in self.bdd.support(expression):
-            if var.endswith("'") and is_primed:
-                remapping[var] = var[:-1] + 'T'
-            elif not var.endswith("'") and not is_primed:
-                remapping[var] = var + 'T'
-
-        for temp_var in remapping.values():
-            self.bdd.declare(temp_var)
-        if remapping:
-            return self.bdd.let(remapping, expression)
-        else:
-            return expression
-        
-            
+        if is_primed:
+            return self.registry.rename(expression, self.registry.primed_to_temporary)
+        return self.registry.rename(expression, self.registry.unprimed_to_temporary)
 
     def _create_new_prop(self, name: Optional[str]= None) -> BDD:
         """Creates a new proposition variable in the model.
@@ -185,16 +229,28 @@ class ExplicitSymbolicModel:
       
             duplicate_indices = self._get_even_occurrence_indices()
 
-    def valuate_states(self, valuations):
-        valuation_cube = np.array(valuations)
-        states_cube = valuation_cube.T
-        for name in self.prop_names:
-            self.bdd.declare(name)
+    def valuate_states(self, valuations: Union[list[list[int]], np.ndarray]) -> None:
+        """Creates the unprimed and primed cube of every state from the valuation matrix.
+
+        The states are also ranked on their valuation (in variable order), which is the order in 
+        which the law and the programs are combined.
+
+        Args:
+            valuations (Union[list[list[int]], np.ndarray]): valuation matrix with a row per 
+            proposition and a column per state
+        """        
+        states_matrix = np.asarray(valuations, dtype=bool).reshape(len(self.prop_names), self._num_states).T
+        # kept to evaluate results on all states at once, see _verdicts
+        self._valuation_matrix = np.ascontiguousarray(states_matrix)
 
-        for i in range(self._num_states):
-            result = {s: bool(v) for s, v in zip(self.prop_names, states_cube[i])}
-            self.states.append(self.bdd.cube(result))
+        # sort on the first proposition first, which is the top variable of the BDD
+        self._state_order = np.lexsort(states_matrix.T[::-1])
+        self._state_rank = np.empty(self._num_states, dtype=np.int64)
+        self._state_rank[self._state_order] = np.arange(self._num_states)
 
+        for row in states_matrix.tolist():
+            self.states.append(self.bdd.cube(dict(zip(self.registry.variables, row))))
+            self.primed_states.append(self.bdd.cube(dict(zip(self.registry.primed, row))))
 
     def _construct_law_expression(self) -> BDD:
         """Constructs a law expression which is a Boolean expression representing all possible 
@@ -203,82 +259,283 @@ class ExplicitSymbolicModel:
         Returns:
             BDD: A Boolean expression representing the union of all states.
         """        
-        result = self.bdd.false
-        for state in self.states:
-            result = result | state
-        return result
+        return balanced_disjunction(self.bdd, [self.states[i] for i in self._state_order])
         
-    def _add_program(self, program: np.ndarray, program_name: str) -> None:
+    def _add_program(self, program: Union[np.ndarray, Edges, Iterable[Edges], CSRProgram], program_name: str) -> None:
         """ Adds the explicit program as a symbolic program to the model.
 
         The explicit program is represented by a matrix of 0s and 1s, where the ones indicate a 
-        transition from the state with the x index to the state with the y index.
+        transition from the state with the x index to the state with the y index, or by the 
+        arrays of source and target indices of the transitions. Large edge lists can also be 
+        streamed in as an iterable of chunks of source and target indices, or be given in 
+        compressed sparse row form (for instance memory mapped from a binary model file).
         
-        A symbolic program is a boolean expression which is the disjunction of all transitions 
-        in the program. A transition is a conjunction of the valuations of the base state and the 
-        primed valuations of the target state.
+        A symbolic program is the disjunction of all transitions in the program, stored as a 
+        PartitionedProgram with (up to cluster_nodes nodes of) chunks of transitions per cluster. 
+        The transitions are grouped per source state, so the source state is conjoined once with
+        the disjunction of all its primed target states.
 
         Args:
-            program (np.ndarray): The program as represented in a matrix of 0s and 1s. Size of the 
-            matrix must match the number of states in the model
+            program (Union[np.ndarray, Edges, Iterable[Edges], CSRProgram]): The program as 
+            represented in a matrix of 0s and 1s, as a pair of source and target index arrays, as
+            an iterable of such pairs or as a CSRProgram. Size of the matrix must match the number
+            of states in the model
             program_name (str): The name of the program. The name must be unique.
 
         Raises:
             ValueError: Program contains a different number of states than the model.
             ValueError: The provided program name is not unique
         """              
-        if program.shape != (self._num_states, self._num_states):
-            raise ValueError("Number of states in the program and in the model don't match")
-        
         if program_name in self.programs:
             raise ValueError(f"The program name '{program_name}' is used at least twice, while program names should be unique")
 
-        # find the source and target state couples as indices
-        base_state_indices, target_state_indices = np.nonzero(program)
-        
-        program_bdd = self.bdd.false
-        
-        for base_state_index, target_state_index in zip(base_state_indices, target_state_indices):
-            base_state = self.states[base_state_index]
-            target_state_primed = self._add_primes(self.states[target_state_index])
+        if isinstance(program, CSRProgram):
+            chunk_bdds = self._csr_to_chunks(program)
+        else:
+            if isinstance(program, np.ndarray):
+                if program.shape != (self._num_states, self._num_states):
+                    raise ValueError("Number of states in the program and in the model don't match")
+                # find the source and target state couples as indices
+                chunks = [np.nonzero(program)]
+            elif isinstance(program, tuple):
+                chunks = [program]
+            else:
+                chunks = program
 
-            transition = base_state & target_state_primed
-            program_bdd = program_bdd | transition
+            chunk_bdds = []
+            for base_state_indices, target_state_indices in chunks:
+                base_state_indices = np.asarray(base_state_indices, dtype=np.int64)
+                target_state_indices = np.asarray(target_state_indices, dtype=np.int64)
+                if (base_state_indices.size and 
+                        max(base_state_indices.max(), target_state_indices.max()) >= self._num_states):
+                    raise ValueError("Number of states in the program and in the model don't match")
+                chunk_bdds.append(self._edges_to_bdd(base_state_indices, target_state_indices))
 
-        program_bdd = cudd.restrict(program_bdd, self.law)
+        partitioned = PartitionedProgram.from_transitions(self.bdd, chunk_bdds, self.cluster_nodes)
+        self.programs[program_name] = partitioned.map(lambda cluster: cudd.restrict(cluster, self.law))
 
-        self.programs[program_name] = program_bdd
+    def add_program(self, program_name: str, program: Union[np.ndarray, Edges, Iterable[Edges], CSRProgram]) -> None:
+        """Adds a new program to the model, in any of the forms the constructor accepts. Only the
+        cached results that use a program with this name are forgotten.
 
-    def check(self, PDL_expression: str, state_valuation: Optional[str]=None, print_bdd_filename: Optional[str]=None) -> list[int]:
-        """Evaluates a PDL expression within the Kripke model. If a state is provided gives the 
-        evaluation of the PDL expression for that state.
+        Args:
+            program_name (str): The name of the program, which must be unique.
+            program (Union[np.ndarray, Edges, Iterable[Edges], CSRProgram]): The program, see 
+            _add_program
+
+        Raises:
+            ValueError: Program contains a different number of states than the model.
+            ValueError: The provided program name is not unique
+        """
+        self._add_program(program, program_name)
+        self.transformer.invalidate({program_name: None})
+
+    def add_transition(self, program_name: str, source: int, target: int) -> None:
+        """Adds the transition between two states (by index) to a program. It is added to the last
+        cluster of the program while that stays below cluster_nodes nodes.
+
+        Args:
+            program_name (str): name of the program
+            source (int): index of the source state
+            target (int): index of the target state
+
+        Raises:
+            ValueError: Unknown program or state
+        """
+        program = self._program(program_name)
+        transition = self._edge(source, target)
+        self._replace_program(program_name, program.with_transition(transition, None, self.cluster_nodes))
+
+    def remove_transition(self, program_name: str, source: int, target: int) -> None:
+        """Removes the transition between two states (by index) from a program. States with the
+        same valuation are the same cube, so the transitions between all such copies are removed.
+
+        Args:
+            program_name (str): name of the program
+            source (int): index of the source state
+            target (int): index of the target state
+
+        Raises:
+            ValueError: Unknown program or state
+        """
+        program = self._program(program_name)
+        transition = self._edge(source, target)
+        self._replace_program(program_name, program.without(transition, self.registry.variables))
+
+    def _program(self, program_name: str) -> PartitionedProgram:
+        if program_name not in self.programs:
+            raise ValueError(f'Unknown program {program_name}, expected one of {list(self.programs)}')
+        return self.programs[program_name]
+
+    def _edge(self, source: int, target: int) -> BDD:
+        for state in (source, target):
+            if not 0 <= state < self._num_states:
+                raise ValueError(f'Unknown state {state}, the model has {self._num_states} states')
+        return self.states[source] & self.primed_states[target]
+
+    def _replace_program(self, program_name: str, program: PartitionedProgram) -> None:
+        """Stores an edited program and forgets the results computed with its old value."""
+        self.transformer.invalidate({program_name: self.programs[program_name]})
+        self.programs[program_name] = program
+
+    def _edges_to_bdd(self, base_state_indices: np.ndarray, target_state_indices: np.ndarray) -> BDD:
+        """Builds the disjunction of the transitions given by the source and target indices.
+
+        Args:
+            base_state_indices (np.ndarray): source state index of every transition
+            target_state_indices (np.ndarray): target state index of every transition
+
+        Returns:
+            BDD: the transitions as a relation over unprimed and primed variables
+        """        
+        if base_state_indices.size == 0:
+            return self.bdd.false
+
+        base_ranks = self._state_rank[base_state_indices]
+        target_ranks = self._state_rank[target_state_indices]
+        edge_order = np.lexsort((target_ranks, base_ranks))
+        base_state_indices = base_state_indices[edge_order]
+        target_state_indices = target_state_indices[edge_order]
+
+        # split the sorted edges in groups with the same source state
+        group_starts = np.flatnonzero(np.diff(base_state_indices, prepend=-1))
+        group_ends = np.append(group_starts[1:], base_state_indices.size)
+
+        per_source = []
+        for start, end in zip(group_starts.tolist(), group_ends.tolist()):
+            targets = [self.primed_states[i] for i in target_state_indices[start:end].tolist()]
+            per_source.append(self.states[base_state_indices[start]] & balanced_disjunction(self.bdd, targets))
+        return balanced_disjunction(self.bdd, per_source)
+
+    def _csr_to_chunks(self, program: CSRProgram) -> list[BDD]:
+        """Builds the transitions of a program in compressed sparse row form, as a disjunction per
+        block of rows.
+
+        The rows are processed in blocks of about CHUNK_SIZE edges, the targets of a block are a 
+        slice of the (possibly memory mapped) index array, so the full edge list is never built 
+        in memory.
+
+        Args:
+            program (CSRProgram): the targets of every state
+
+        Raises:
+            ValueError: Program contains a different number of states than the model.
+
+        Returns:
+            list[BDD]: the transitions of every block as a relation over unprimed and primed 
+            variables
+        """        
+        indptr, indices = program
+        if len(indptr) != self._num_states + 1:
+            raise ValueError("Number of states in the program and in the model don't match")
+
+        # the first row of every block of rows
+        block_starts = np.unique(np.searchsorted(indptr, np.arange(0, indptr[-1], CHUNK_SIZE), side='right') - 1)
+        block_ends = np.append(block_starts[1:], self._num_states)
+
+        chunk_bdds = []
+        for first_row, end_row in zip(block_starts.tolist(), block_ends.tolist()):
+            row_lengths = np.diff(indptr[first_row:end_row + 1])
+            base_state_indices = np.repeat(np.arange(first_row, end_row), row_lengths)
+            target_state_indices = np.asarray(indices[indptr[first_row]:indptr[end_row]], dtype=np.int64)
+            if target_state_indices.size and target_state_indices.max() >= self._num_states:
+                raise ValueError("Number of states in the program and in the model don't match")
+            chunk_bdds.append(self._edges_to_bdd(base_state_indices, target_state_indices))
+        return chunk_bdds
+
+    def check(self, PDL_expression: str, state_valuation: Optional[str]=None, print_bdd_filename: Optional[str]=None) -> np.ndarray:
+        """Evaluates a PDL expression within the Kripke model and returns its verdict in every 
+        state.
 
         Args:
             PDL_expression (str): A PDL formula in ---TODO--- style.
             state_valuation (Optional[str], optional): A Boolean expression describing the valuation
             of a specific state. The state must exist in the model. Defaults to None.
 
-        Raises:
-            ValueError: State doesn't exist in the model.
-
         Returns:
-            Union[bool, str]: 
-                - If a state is provided: a Boolean for the evaluation of the PDL expression in that
-                  state. 
-                - If no state is provided: the boolean expression describing the evaluation of the
-                  PDL expression in the model.
+            np.ndarray: 1 for every state (in input order) where the formula holds, 0 elsewhere
         """        
         
         states_where_true = self.transformer.evaluate_expression(PDL_expression)
-        result = []
-        for state in self.states:
-            if state.implies(states_where_true) == self.bdd.true:
-                result.append(1)
-            else:
-                result.append(0)
-        return result
+        return self._verdicts(states_where_true)
+
+    def _verdicts(self, expression: BDD) -> np.ndarray:
+        """Evaluates a boolean expression over the unprimed variables in every state at once.
+
+        The nodes of the expression are numbered in a table (the proposition they test, their two
+        children and whether the edges to the children are complemented). All states then walk 
+        down the table together, one level per step, so the cost is one table lookup per state 
+        and level instead of a BDD operation per state.
+
+        Args:
+            expression (BDD): boolean expression over the unprimed variables
+
+        Raises:
+            ValueError: The expression depends on variables that are not propositions
+
+        Returns:
+            np.ndarray: 1 for every state where the expression is true, 0 elsewhere
+        """        
+        if expression == self.bdd.true or expression == self.bdd.false:
+            return np.full(self._num_states, int(expression == self.bdd.true), dtype=np.uint8)
+
+        column = {var: index for index, var in enumerate(self.registry.variables)}
+        root = ~expression if expression.negated else expression
+        # regular (not complemented) nodes in table order, CUDD represents false as the 
+        # complement of true, so the true terminal (index 0) is the only terminal in the table
+        node_index = {self.bdd.true: 0}
+        columns, children, negated_edges = [0], [(self.bdd.true, self.bdd.true)], [(False, False)]
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node in node_index:
+                continue
+            if node.var not in column:
+                raise ValueError(f'The expression depends on {node.var}, which is not a proposition')
+            node_index[node] = len(columns)
+            low, high = node.low, node.high
+            low_negated, high_negated = low.negated, high.negated
+            low, high = ~low if low_negated else low, ~high if high_negated else high
+            columns.append(column[node.var])
+            children.append((low, high))
+            negated_edges.append((low_negated, high_negated))
+            stack.extend((low, high))
+
+        # the terminal points to itself, so states that reached it stay there
+        columns = np.array(columns, dtype=np.int64)
+        lows, highs = np.array([[node_index[child] for child in pair] for pair in children], dtype=np.int64).T
+        low_negated, high_negated = np.array(negated_edges, dtype=bool).T
+
+        current = np.full(self._num_states, node_index[root], dtype=np.int64)
+        negated = np.full(self._num_states, bool(expression.negated))
+        active = np.arange(self._num_states)
+        while active.size:
+            nodes = current[active]
+            bits = self._valuation_matrix[active, columns[nodes]]
+            current[active] = np.where(bits, highs[nodes], lows[nodes])
+            negated[active] ^= np.where(bits, high_negated[nodes], low_negated[nodes])
+            active = active[current[active] != 0]
+        return (~negated).astype(np.uint8)
         
         
+    def witness(self, PDL_expression: str, state_valuation: Optional[str] = None) -> Optional[Witness]:
+        """Returns a shortest path that shows why <program>formula holds (a witness) or why 
+        [program]formula fails (a counterexample), see WitnessExtractor.
+
+        Args:
+            PDL_expression (str): A diamond or box formula.
+            state_valuation (Optional[str], optional): A Boolean expression describing the state 
+            the path starts in. Defaults to None, any state of the model.
+
+        Raises:
+            ValueError: The formula is not a diamond or a box
+
+        Returns:
+            Optional[Witness]: the path, or None if the diamond holds nowhere or the box everywhere
+            (in the given state)
+        """
+        return WitnessExtractor(self).extract(PDL_expression, state_valuation)
+
     def file_tests(self) -> None:
         return self.tests
     
@@ -1,7 +1,122 @@
+import gzip
+import itertools
+import os
 import numpy as np
+from typing import Iterator, TextIO
+
+Edges = tuple[np.ndarray, np.ndarray]
+
+# number of matrix entries or edges that are parsed at once
+CHUNK_SIZE = 1_000_000
+
+
+def open_input(file: str) -> TextIO:
+    """Opens an input file for reading, gzipped files (ending in .gz) are decompressed on the fly.
+
+    Args:
+        file (str): path to the file
+
+    Returns:
+        TextIO: the opened file
+    """
+    if file.endswith('.gz'):
+        return gzip.open(file, 'rt')
+    return open(file, 'r')
+
+
+def parse_rows(lines: list[str]) -> np.ndarray:
+    """Parses lines of whitespace separated integers in one go.
+
+    Args:
+        lines (list[str]): lines with the same number of integers
+
+    Returns:
+        np.ndarray: matrix with a row per line
+    """
+    return np.loadtxt(lines, dtype=np.int64, ndmin=2)
+
+
+def read_dense_program(f: TextIO, first_line: str) -> Edges:
+    """Reads a program in matrix notation and converts it to source and target indices, a chunk of
+    rows at a time, so the full matrix is never held in memory.
+
+    Args:
+        f (TextIO): input file, positioned after the first row of the matrix
+        first_line (str): first row of the matrix
+
+    Returns:
+        Edges: the source and target index of every transition
+    """
+    num_states = len(first_line.split())
+    rows_per_chunk = max(1, CHUNK_SIZE // num_states)
+
+    sources, targets = [], []
+    lines = [first_line] + list(itertools.islice(f, min(rows_per_chunk, num_states) - 1))
+    offset = 0
+    while lines:
+        chunk_sources, chunk_targets = np.nonzero(parse_rows(lines))
+        sources.append(chunk_sources + offset)
+        targets.append(chunk_targets)
+        offset += len(lines)
+        rows_left = num_states - offset
+        lines = list(itertools.islice(f, min(rows_per_chunk, rows_left))) if rows_left > 0 else []
+
+    return np.concatenate(sources), np.concatenate(targets)
+
+
+def read_edge_list(f: TextIO) -> Iterator[Edges]:
+    """Reads 'source target' lines up to the first empty line (or the end of the file), in chunks
+    of CHUNK_SIZE edges.
+
+    Args:
+        f (TextIO): input file, positioned at the first edge
+
+    Yields:
+        Iterator[Edges]: the source and target indices of a chunk of edges
+    """
+    lines = list(itertools.takewhile(lambda line: line.split(), itertools.islice(f, CHUNK_SIZE)))
+    while lines:
+        edges = parse_rows(lines)
+        yield edges[:, 0], edges[:, 1]
+        if len(lines) < CHUNK_SIZE:
+            return
+        lines = list(itertools.takewhile(lambda line: line.split(), itertools.islice(f, CHUNK_SIZE)))
+
+
+def stream_edge_file(file: str) -> Iterator[Edges]:
+    """Streams the edges of an edge list file (optionally gzipped) in chunks. The file is only
+    opened when the chunks are requested, so the edges go straight from disk into the model.
+
+    Args:
+        file (str): path to a file with a 'source target' line per transition
+
+    Yields:
+        Iterator[Edges]: the source and target indices of a chunk of edges
+    """
+    with open_input(file) as f:
+        yield from read_edge_list(f)
+
 
 def SymbolicModelFromMatrix(file: str) -> tuple[int, list, list, list, list, list]:
-    components = ['STATES', 'PROPS', 'PROGS', 'TESTS']
+    """Reads an explicit model. The file (optionally gzipped) contains the sections
+
+    - STATES: the number of states
+    - PROPS: per proposition its name, followed by a line with its valuation in every state
+    - PROGS: per program its name, followed by its transition matrix
+    - EDGES: per program its name, followed by a 'source target' line per transition, or a line
+      with its name and the path to a separate (optionally gzipped) edge list file, relative to
+      the directory of the model file
+    - TESTS: a PDL formula per line
+
+    Args:
+        file (str): path to the input file
+
+    Returns:
+        tuple[int, list, list, list, list, list]: number of states, valuations, proposition names,
+        programs (as source and target index arrays, or as an iterator over chunks of those for
+        edge list files), program names and tests
+    """
+    components = ['STATES', 'PROPS', 'PROGS', 'EDGES', 'TESTS']
     mode = None
     num_states = 0
     valuations = []
@@ -10,8 +125,8 @@ def SymbolicModelFromMatrix(file: str) -> tuple[int, list, list, list, list, lis
     program_names = []
     tests = []
 
-    
-    with open(file, 'r') as f:
+
+    with open_input(file) as f:
         line = f.readline()
         while line:
             if len(line.split()) == 0:
@@ -27,23 +142,30 @@ def SymbolicModelFromMatrix(file: str) -> tuple[int, list, list, list, list, lis
                 if len(line.split()) == 1:
                     valuation_names.append(line.strip())
                     line = f.readline()
-                    valuations.append([int(x) for x in line.split()])
+                    valuations.append(np.array(line.split(), dtype=np.int8))
                 line = f.readline()
             elif mode == 'PROGS':
                 if len(line.split()) == 1:
                     program_names.append(line.strip())
                     line = f.readline()
-                    
-                    programs.append(np.array([[int(x) for x in line.split()]]))
-                    for _ in range(len(programs[-1][0])-1):
-                        line = f.readline()
-                        programs[-1] = np.vstack([programs[-1], [int(x) for x in line.split()]])
+                    if len(line.split()) != num_states:
+                        raise ValueError("Number of states in the program and in the model don't match")
+                    programs.append(read_dense_program(f, line))
 
                 line = f.readline()
+            elif mode == 'EDGES':
+                name, *edge_file = line.split()
+                program_names.append(name)
+                if edge_file:
+                    # relative to the model file, an absolute path is kept by join
+                    programs.append(stream_edge_file(os.path.join(os.path.dirname(file), edge_file[0])))
+                else:
+                    programs.append(list(read_edge_list(f)))
+                line = f.readline()
             elif mode == 'TESTS':
                 tests.append(line.strip())
                 line = f.readline()
             else:
                 line = f.readline()
-    
+
     return num_states, valuations, valuation_names, programs, program_names, tests
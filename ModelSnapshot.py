@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import dd.cudd as cudd
+from typing import Iterable, Optional
+from PartitionedProgram import PartitionedProgram
+
+BDD = cudd.BDD
+
+SNAPSHOT_VERSION = 4
+# prefixes of the root names in the BDD dump
+PROGRAM_PREFIX = 'program:'
+CLOSURE_PREFIX = 'closure:'
+
+
+def file_checksum(file: str) -> str:
+    """Computes the SHA-256 checksum of a file.
+
+    Args:
+        file (str): path to the file
+
+    Returns:
+        str: hexadecimal checksum
+    """
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def root_file_name(snapshot_file: str, index: int) -> str:
+    """Returns the name of the DDDMP file holding one root of a snapshot, next to the metadata."""
+    return f'{os.path.splitext(snapshot_file)[0]}.{index}.dddmp'
+
+
+def save_snapshot(model, snapshot_file: str, source_file: str, closures: Iterable[str] = ()) -> None:
+    """Writes a symbolic model to disk, so it can be reloaded without parsing its source file.
+
+    The snapshot consists of a JSON metadata file (source checksum, variable order, program 
+    names, tests) and a DDDMP file per BDD: the law, the initial states, the clusters of the 
+    restricted programs and the requested closures. DDDMP is CUDD's own format, which is loaded without going through Python per node.
+    The metadata is written last, so an interrupted save never leaves a snapshot that looks 
+    valid.
+
+    Args:
+        model (SymbolicModel): the model to store
+        snapshot_file (str): path of the metadata file
+        source_file (str): the file the model was read from
+        closures (Iterable[str], optional): names of programs whose reflexive transitive closure
+        is computed and stored as well. Defaults to ().
+
+    Raises:
+        ValueError: The model is not on the cudd backend
+    """
+    if not model.backend.snapshots:
+        raise ValueError(f'Snapshots can only be written for the cudd backend, not for {model.backend.name}')
+    roots = [('law', model.law)]
+    if model.init is not None:
+        roots.append(('init', model.init))
+    for name, program in model.programs.items():
+        for index, cluster in enumerate(program.clusters):
+            roots.append((f'{PROGRAM_PREFIX}{name}:{index}', cluster))
+    closures = list(closures)
+    for name in closures:
+        roots.append((CLOSURE_PREFIX + name, model.transformer.closure(model.programs[name])))
+
+    root_files = {}
+    for index, (root_name, root) in enumerate(roots):
+        root_file = root_file_name(snapshot_file, index)
+        model.bdd.dump(root_file, roots=[root], filetype='dddmp')
+        root_files[root_name] = os.path.basename(root_file)
+
+    metadata = {
+        'version': SNAPSHOT_VERSION,
+        'source_checksum': file_checksum(source_file),
+        'variable_order': sorted(model.bdd.vars, key=model.bdd.level_of_var),
+        'variables': model.variables,
+        # per program the modified variables of every cluster, None for a cluster without frame
+        'programs': {name: [None if modified is None else sorted(modified) for modified in program.modified]
+                     for name, program in model.programs.items()},
+        'closures': closures,
+        'tests': model.tests,
+        'root_files': root_files,
+    }
+    with open(snapshot_file, 'w') as f:
+        json.dump(metadata, f, indent=1)
+
+
+def load_snapshot(snapshot_file: str, source_file: str) -> Optional[tuple[cudd.BDD, list[str], BDD, dict[str, PartitionedProgram], list[str], dict[str, BDD], Optional[BDD]]]:
+    """Loads a snapshot written by save_snapshot, if it is still valid for the source file.
+
+    The variables are declared in the stored order and dynamic reordering is off while the BDDs
+    are loaded, so the nodes are read in their final order.
+
+    Args:
+        snapshot_file (str): path of the metadata file
+        source_file (str): the file the model is read from
+
+    Returns:
+        Optional[tuple[cudd.BDD, list[str], BDD, dict[str, PartitionedProgram], list[str], dict[str, BDD], Optional[BDD]]]:
+        the BDD manager, variables, law, programs, tests, the stored closures per program name
+        and the initial states, or None if there is no snapshot or the source file changed since
+        it was written
+    """
+    try:
+        with open(snapshot_file, 'r') as f:
+            metadata = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if metadata.get('version') != SNAPSHOT_VERSION or metadata['source_checksum'] != file_checksum(source_file):
+        return None
+
+    directory = os.path.dirname(snapshot_file)
+    root_files = {name: os.path.join(directory, file) for name, file in metadata['root_files'].items()}
+    if not all(os.path.exists(file) for file in root_files.values()):
+        return None
+
+    bdd = cudd.BDD()
+    bdd.declare(*metadata['variable_order'])
+    reordering = bdd.configure(reordering=False)['reordering']
+    roots = {name: bdd.load(file)[0] for name, file in root_files.items()}
+    bdd.configure(reordering=reordering)
+
+    programs = {name: PartitionedProgram(bdd, [roots[f'{PROGRAM_PREFIX}{name}:{index}'] for index in range(len(modified))],
+                                         [None if variables is None else frozenset(variables) for variables in modified])
+                for name, modified in metadata['programs'].items()}
+    closures = {name: roots[CLOSURE_PREFIX + name] for name in metadata['closures']}
+    return bdd, metadata['variables'], roots['law'], programs, metadata['tests'], closures, roots.get('init')
@@ -1,23 +1,177 @@
 from lark import Transformer, Lark
 import dd.cudd as _bdd
+from Backend import backend_of
+from PartitionedProgram import PartitionedProgram
+from QueryPlan import PlanCompiler, PlanNode, SubformulaCache
 
-from typing import Union
+import weakref
+from time import perf_counter
+from typing import Optional, Union
 
 BDD = _bdd.BDD
-FormulaItems = list[Union[str, BDD]]
+FormulaItems = list[Union[str, BDD, PartitionedProgram]]
+Program = Union[BDD, PartitionedProgram]
+
+
+STAR_STRATEGIES = ('auto', 'frontier', 'squaring')
+
+
+class Closure:
+    def __init__(self, program: Program):
+        """The reflexive transitive closure of a program, which is not built yet.
+
+        Directly under a modality the closure is never needed as a relation, <a*>p and [a*]p are 
+        evaluated as fixpoints over sets of states instead. Only when the closure is used inside
+        another program (for instance in a*;b) it is built with PDLTransformer.closure.
+
+        Args:
+            program (Program): the program that is iterated, as a relation or partitioned
+        """        
+        self.program = program
 
 
 class PDLTransformer(Transformer):
-    def __init__(self, model):
-        self.model = model
-        self.identity = self.find_identity()
-        self.parser = Lark(self.grammar,
-                            parser='earley',
-                            lexer='basic')
+    _parser = None
+
+    def __init__(self, model, star_strategy: str = 'auto', cache_max_nodes: Optional[int] = None):
+        if star_strategy not in STAR_STRATEGIES:
+            raise ValueError(f'Unknown star strategy {star_strategy}, expected one of {STAR_STRATEGIES}')
+        # the model owns the transformer, a weak reference avoids a reference cycle that would let
+        # the garbage collector free the BDD manager before the BDDs cached in the transformer
+        self.model = weakref.proxy(model)
+        self.star_strategy = star_strategy
+        self.backend = backend_of(self.model.bdd)
+        self.fixpoint_log = []
+        # built on first use, after rewriting only tests and closures inside iterations need it
+        self._identity = None
+        # the law over the temporary variables, the intermediate states of a composition
+        self.temporary_law = self.model._add_temporary(self.model.law, is_primed=False)
+        # materialized closures per program, kept for the lifetime of the model
+        self.closures = {}
+        self.parser = self.get_parser()
+        self.compiler = PlanCompiler()
+        self.plans = {}
+        self.cache = SubformulaCache(self.model.bdd, cache_max_nodes)
+        # the Profiler attached to this transformer, if any
+        self.profiler = None
         
     def evaluate_expression(self, test: str) -> BDD:
-        self.tree = self.parser.parse(test)
-        return self.transform(self.tree)
+        self.fixpoint_log = []
+        self.model.reordering.before_check(test)
+        result = self.evaluate_plan(self.compile(test))
+        self.model.reordering.after_check(test)
+        return result
+
+    @classmethod
+    def get_parser(cls) -> Lark:
+        """Returns the LALR parser for PDL formulas. The parser is built once per process and
+        shared by all transformers, and lark caches the compiled grammar on disk, so later 
+        processes skip the grammar analysis as well.
+
+        Returns:
+            Lark: the PDL parser
+        """        
+        if cls._parser is None:
+            cls._parser = Lark(cls.grammar,
+                               parser='lalr',
+                               lexer='basic',
+                               cache=True)
+        return cls._parser
+
+    def compile(self, test: str, rewrite: bool = True) -> PlanNode:
+        """Parses a PDL formula and compiles it to a query plan. Plans are kept per formula string,
+        so every formula is parsed only once per model.
+
+        By default the modalities are pushed through tests, sequences and choices (see 
+        PlanCompiler.rewrite), so those are evaluated over sets of states instead of building
+        their relation.
+
+        Args:
+            test (str): PDL formula
+            rewrite (bool, optional): rewrite the modalities. Defaults to True, False gives the
+            plan of the formula as it is written.
+
+        Returns:
+            PlanNode: the root of the query plan
+        """        
+        plan = self.plans.get(test)
+        if plan is None:
+            self.tree = self.parser.parse(test)
+            plan = self.compiler.transform(self.tree)
+            self.plans[test] = plan
+        return self.compiler.rewrite(plan) if rewrite else plan
+
+    def evaluate_plan(self, plan: PlanNode) -> BDD:
+        """Evaluates a query plan bottom-up with the rules of this transformer. The result of every
+        node is stored in the subformula cache, so subterms shared between formulas (or within 
+        one formula) are only evaluated once. The nodes of the plan are pinned in the cache while 
+        it is evaluated. With a profiler attached, every rule is timed and cache hits are counted.
+
+        Args:
+            plan (PlanNode): root of the query plan
+
+        Returns:
+            BDD: the evaluation of the plan
+        """        
+        profiler = self.profiler
+        results = {}
+        pinned = []
+        stack = [(plan, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if node in results:
+                continue
+
+            if not children_done:
+                cached = self.cache.get(node)
+                if cached is not None:
+                    results[node] = cached
+                    if profiler is not None:
+                        profiler.cache_hit(node)
+                    continue
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+                continue
+
+            items = [results[item] if isinstance(item, PlanNode) else item for item in node.items]
+            rule = getattr(self, node.op)
+            results[node] = rule(items) if profiler is None else profiler.rule(node, rule, items)
+            self.cache.pin(node)
+            pinned.append(node)
+            self.cache.put(node, results[node])
+
+        for node in pinned:
+            self.cache.unpin(node)
+        return results[plan]
+
+    def invalidate(self, programs: Optional[dict[str, Optional[Program]]] = None, law: bool = False) -> None:
+        """Forgets the results that an edit of the model makes invalid, see SymbolicModel.
+        add_transition and the like. Compiled plans stay valid, so no formula is parsed again.
+
+        Cached subformulas are removed when they use one of the changed programs, or when the 
+        law changed and they contain a modality or a composition. Closures are stored per 
+        program value, so the closure of a changed program is never found again, the closures 
+        of the old programs (and of unions with them) are only removed to free their nodes. A
+        changed law removes all closures.
+
+        Args:
+            programs (Optional[dict[str, Optional[Program]]], optional): the changed programs
+            with their value before the edit, None for a new program. Defaults to None.
+            law (bool, optional): the law changed. Defaults to False.
+        """
+        programs = programs or {}
+        names = frozenset(programs)
+        self.cache.invalidate(lambda node: bool(node.programs & names) or (law and node.uses_law))
+
+        if law:
+            self.temporary_law = self.model._add_temporary(self.model.law, is_primed=False)
+            self.closures.clear()
+            return
+        old_clusters = {cluster for program in programs.values() if isinstance(program, PartitionedProgram)
+                        for cluster in program.clusters}
+        for prog in list(self.closures):
+            if isinstance(prog, PartitionedProgram) and old_clusters.intersection(prog.clusters):
+                del self.closures[prog]
     
     grammar =  """ 
             ?start: formula
@@ -36,14 +190,34 @@ class PDLTransformer(Transformer):
             ?conjunction: unary
                         | conjunction CONJUNCTION unary                         -> and_
 
-            ?unary: NEGATE unary                                                -> not_
-                        | SYMBOL                                                -> formula_symbol
-                        | LPAR formula RPAR                                     -> parens
+            ?unary: unary_operator
+                        | name                                                  -> formula_symbol
+
+            ?unary_operator: NEGATE unary                                       -> not_
+                        | LPAR formula_operator RPAR                            -> parens
                         | modal
 
             ?modal: "[" program "]" formula                                     -> box
                         | "<" program ">" formula                               -> diamond
 
+            // the *_operator rules are formulas and programs that are not a (parenthesized) name,
+            // a parenthesized name is only resolved to a formula or program symbol after the closing
+            // parenthesis, which keeps "(p)?" and "(a)" apart for the LALR parser
+            ?formula_operator: implication_operator
+                        | implication BICONDITIONAL biconditional               -> equiv
+
+            ?implication_operator: disjunction_operator
+                        | disjunction IMPLICATION implication                   -> implies
+
+            ?disjunction_operator: conjunction_operator
+                        | disjunction DISJUNCTION conjunction                   -> or_
+
+            ?conjunction_operator: unary_operator
+                        | conjunction CONJUNCTION unary                         -> and_
+
+            ?name: SYMBOL
+                        | "(" name ")"
+
             ?program: sequence
 
             ?sequence: choice
@@ -55,11 +229,25 @@ class PDLTransformer(Transformer):
             ?iteration: program_atom
                         | program_atom ITERATION                                -> star
 
-            ?test: formula TEST   -> test
+            ?program_atom: name                                                 -> program_symbol
+                        | program_atom_operator
+
+            ?program_atom_operator: test
+                        | LPAR program_operator RPAR                            -> parens_prog
+
+            ?test: formula TEST                                                 -> test
+
+            ?program_operator: sequence_operator
+
+            ?sequence_operator: choice_operator
+                        | choice SEQUENCE sequence                              -> seq
+
+            ?choice_operator: choice CHOICE iteration                           -> choice
+                        | iteration_operator
+
+            ?iteration_operator: program_atom_operator
+                        | program_atom ITERATION                                -> star
 
-            ?program_atom: SYMBOL                                               -> program_symbol
-                        | test
-                        | LPAR program RPAR                                     -> parens_prog
             %ignore " "
             TEST: "?"
             SEQUENCE: ";"
@@ -97,7 +285,7 @@ class PDLTransformer(Transformer):
             raise ValueError(f"Expected formula symbol, got unknown: {name}")
         return self.model.bdd.var(name)
 
-    def program_symbol(self, items: FormulaItems) -> BDD:
+    def program_symbol(self, items: FormulaItems) -> Program:
         """Returns the program from the model given by the items list
 
         Args:
@@ -107,7 +295,7 @@ class PDLTransformer(Transformer):
             ValueError: The given program name is not found in the model
 
         Returns:
-            BDD: Returns the program BDD from the model
+            Program: Returns the (partitioned) program from the model
         """        
         name = str(items[0])
         if name not in self.model.programs.keys():
@@ -176,44 +364,282 @@ class PDLTransformer(Transformer):
         return self.model.bdd.apply('xor', items[0], items[2])
 
     def diamond(self, items: FormulaItems) -> BDD:
-        """_summary_
+        """Returns the states from which the program can reach a state satisfying the formula.
+
+        Evaluated as a relational product (AND-EXISTS) of the program and the primed formula (per
+        cluster for a partitioned program), so the conjunction over both state copies is never 
+        built on its own. For an iterated program <a*>formula is evaluated as the least fixpoint
+        of formula | <a>X.
 
         Args:
-            items (FormulaItems): _description_
+            items (FormulaItems): The AST tree given by the lark parser, with the program as the
+            first item and the formula as the second item.
 
         Returns:
-            BDD: _description_
+            BDD: The states where <program>formula holds
         """        
-        prog = items[0]
-        formula = items[1]
+        if isinstance(items[0], Closure):
+            return self._reachability_fixpoint(items[0].program, items[1], 'diamond')
 
-        primed_variables = ([s for s in self.model.bdd.support(prog) if s.endswith("'")])
-
-        return self.model.bdd.exist(primed_variables, prog & self.model._add_primes(self.model.law) & self.model._add_primes(formula))
+        return self._preimage(self._guard_program(items[0]), items[1])
 
     def box(self, items: FormulaItems) -> BDD:
-        prog = items[0]
-        formula = items[1]
+        """Returns the states from which every program transition ends in a state satisfying the
+        formula.
 
-        primed_variables = ([s for s in self.model.bdd.support(prog) if s.endswith("'")])
-        
-        return self.model.bdd.forall(primed_variables, (prog & self.model._add_primes(self.model.law)).implies(self.model._add_primes(formula)))
+        Evaluated as a single relational product (OR-FORALL) of the negated law-guarded program 
+        and the primed formula, for a partitioned program through its dual !<a>!formula. For an
+        iterated program [a*]formula is evaluated as the greatest fixpoint of formula & [a]X, 
+        through its dual !<a*>!formula.
+
+        Args:
+            items (FormulaItems): The AST tree given by the lark parser, with the program as the
+            first item and the formula as the second item.
+
+        Returns:
+            BDD: The states where [program]formula holds
+        """        
+        if isinstance(items[0], Closure):
+            return ~self._reachability_fixpoint(items[0].program, ~items[1], 'box')
+        if isinstance(items[0], PartitionedProgram):
+            return ~self._preimage(items[0], ~items[1])
+
+        prog = self._guard_program(items[0])
+        formula = self.model._add_primes(items[1])
+
+        return self.backend.or_forall(~prog, formula, self.model.registry.primed_variables)
+
+    def _preimage(self, guarded_prog: Program, states: BDD) -> BDD:
+        """Returns the states with a transition of the (law-guarded) program into the given states.
+
+        For a partitioned program the preimage is the union of the preimages of the clusters. 
+        The primed law is conjoined to the target states instead of to the clusters, and the 
+        primed variables a cluster does not depend on are quantified from the target before the
+        product with that cluster (early quantification), so every product only quantifies the 
+        variables of its cluster. For a framed cluster the unchanged variables are substituted by
+        their unprimed copies in the target, so only the modified ones are quantified.
+
+        Args:
+            guarded_prog (Program): program conjoined with the primed law, or a partitioned 
+            program
+            states (BDD): boolean expression over the unprimed variables
+
+        Returns:
+            BDD: the states from which the program can reach one of the given states
+        """        
+        primed_variables = self.model.registry.primed_variables
+        if not isinstance(guarded_prog, PartitionedProgram):
+            return self.backend.and_exists(guarded_prog, self.model._add_primes(states), primed_variables)
+
+        registry = self.model.registry
+        target = self.model.primed_law & self.model._add_primes(states)
+        framed_targets = {None: target}
+        targets = {}
+        result = self.model.bdd.false
+        for cluster, support, modified in zip(guarded_prog.clusters, guarded_prog.supports, guarded_prog.modified):
+            # a framed cluster keeps the variables it does not modify, so the target is read with
+            # their unprimed copies and only the primed copies of the modified variables remain
+            if modified not in framed_targets:
+                unchanged = {registry.prime_map[var]: var for var in registry.unprimed_variables - modified}
+                framed_targets[modified] = registry.rename(target, unchanged)
+            remaining = primed_variables if modified is None else frozenset(registry.prime_map[var] for var in modified)
+            untouched = remaining - support
+            if (modified, untouched) not in targets:
+                targets[modified, untouched] = self.model.bdd.exist(untouched, framed_targets[modified])
+            result |= self.backend.and_exists(cluster, targets[modified, untouched], remaining & support)
+        return result
+
+    def _postimage(self, program: PartitionedProgram, states: BDD) -> BDD:
+        """Returns the states that can be reached with one transition of the program, computed
+        per cluster. A framed cluster only quantifies the variables it modifies, the others keep 
+        their value and stay in the image.
+
+        Args:
+            program (PartitionedProgram): program of the model
+            states (BDD): boolean expression over the unprimed variables
+
+        Returns:
+            BDD: the target states within the law, over the unprimed variables
+        """        
+        registry = self.model.registry
+        targets = self.model.bdd.false
+        for cluster, modified in zip(program.clusters, program.modified):
+            if modified is None:
+                image = self.backend.and_exists(states, cluster, registry.unprimed_variables)
+                targets |= registry.rename(image, registry.unprime_map)
+            else:
+                image = self.backend.and_exists(states, cluster, modified)
+                targets |= registry.rename(image, {registry.prime_map[var]: var for var in modified})
+        return targets & self.model.law
+
+    def _reachability_fixpoint(self, prog: Program, formula: BDD, operator: str,
+                               rings: Optional[list[BDD]] = None, until: Optional[BDD] = None) -> BDD:
+        """Returns the states from which a state satisfying the formula is reachable with zero or
+        more steps of the program (the least fixpoint of formula | <prog>X).
+
+        Every round only the preimage of the states found in the previous round is computed. The
+        node count and time of every round are appended to fixpoint_log.
+
+        Args:
+            prog (Program): the iterated program, as a relation or partitioned
+            formula (BDD): the states that should be reached
+            operator (str): the modality that is evaluated, used in the fixpoint log
+            rings (Optional[list[BDD]], optional): when given, the states found in every round 
+            (the onion rings, starting with the formula) are appended, the states of ring k reach
+            the formula in k steps and no fewer. Defaults to None.
+            until (Optional[BDD], optional): stop as soon as one of these states is found, the
+            result is then only part of the fixpoint. Defaults to None.
+
+        Returns:
+            BDD: the states satisfying <prog*>formula
+        """        
+        log = {'operator': operator + ' fixpoint', 'strategy': 'frontier', 'iterations': []}
+        self.fixpoint_log.append(log)
+
+        guarded_prog = self._guard_program(prog)
+        result = formula
+        frontier = formula
+        if rings is not None:
+            rings.append(formula)
+        while frontier != self.model.bdd.false:
+            if until is not None and result & until != self.model.bdd.false:
+                break
+            t0 = perf_counter()
+            frontier = self._preimage(guarded_prog, frontier) & ~result
+            result = result | frontier
+            self._log_iteration(log, result, t0, frontier)
+            if rings is not None and frontier != self.model.bdd.false:
+                rings.append(frontier)
+        return result
+
+    def _guard_program(self, prog: Program) -> Program:
+        """Conjoins the primed law to a program, so transitions can only end in valid states. A
+        partitioned program is returned as it is, _preimage conjoins the primed law to the target
+        states instead.
+
+        Args:
+            prog (Program): program as a boolean expression over unprimed and primed variables,
+            or partitioned
+
+        Returns:
+            Program: the program restricted to transitions with a target state in the law
+        """        
+        if isinstance(prog, PartitionedProgram):
+            return prog
+        return prog & self.model.primed_law
 
     def seq(self, items: FormulaItems) -> BDD:
-        item_a, item_b = items[0], items[2]
+        item_a, item_b = self._relation(items[0]), self._relation(items[2])
         return self.compose(item_a, item_b)
 
-    def choice(self, items: FormulaItems) -> BDD:
-        return items[0] | items[2]
+    def choice(self, items: FormulaItems) -> Program:
+        item_a, item_b = self._relation(items[0]), self._relation(items[2])
+        if isinstance(item_a, PartitionedProgram):
+            return item_a.union(item_b)
+        if isinstance(item_b, PartitionedProgram):
+            return PartitionedProgram.wrap(self.model.bdd, item_a).union(item_b)
+        return item_a | item_b
+
+    def star(self, items: FormulaItems) -> Closure:
+        """Returns the iterated program as a Closure, which is only built as a relation when it is
+        used inside another program.
+
+        Args:
+            items (FormulaItems): The AST tree given by the lark parser, with the program as the
+            first item.
+
+        Returns:
+            Closure: The closure of the program
+        """        
+        if isinstance(items[0], Closure):
+            return items[0]
+        return Closure(items[0])
 
-    def star(self, items: FormulaItems) -> BDD:
-        prog = items[0]
-        old_result = self.identity
-        new_result = self.identity | self.compose(old_result, prog)
-        while old_result != new_result:
-            old_result = new_result
-            new_result = self.identity | self.compose(old_result, prog)
-        return new_result
+    def _relation(self, prog: Union[Program, Closure]) -> Program:
+        """Returns a program as a relation, building the closure if the program is iterated. A 
+        partitioned program stays partitioned.
+
+        Args:
+            prog (Union[Program, Closure]): evaluated program
+
+        Returns:
+            Program: the program as a relation over unprimed and primed variables
+        """        
+        if isinstance(prog, Closure):
+            return self.closure(prog.program)
+        return prog
+
+    def closure(self, prog: Program) -> BDD:
+        """Returns the reflexive transitive closure of the program.
+
+        Depending on star_strategy the closure is computed with
+        - 'frontier': every round only the pairs found in the previous round are composed with
+          the program, and the fixpoint is reached when no new pairs are found.
+        - 'squaring': the closure of paths up to length k is composed with itself, which doubles
+          k every round, so deep programs need only a logarithmic number of rounds.
+        - 'auto': frontier rounds, switching to squaring once the number of rounds exceeds the 
+          number of state variables (a sign of a long diameter).
+
+        The node count and time of every round are appended to fixpoint_log. Built closures are
+        kept in self.closures, so every program is only iterated once.
+
+        Args:
+            prog (Program): The program as a relation or partitioned
+
+        Returns:
+            BDD: The closure of the program
+        """        
+        result = self.closures.get(prog)
+        if result is None:
+            result = self._build_closure(prog)
+            self.closures[prog] = result
+        return result
+
+    def _build_closure(self, prog: Program) -> BDD:
+        log = {'operator': 'star', 'strategy': self.star_strategy, 'iterations': []}
+        self.fixpoint_log.append(log)
+
+        if self.star_strategy == 'squaring':
+            relation = prog.relation(self.model.registry.variables) if isinstance(prog, PartitionedProgram) else prog
+            return self._star_squaring(self.identity | relation, log)
+
+        squaring_threshold = len(self.model.registry.variables)
+        result = self.identity
+        frontier = self.identity
+        while frontier != self.model.bdd.false:
+            if self.star_strategy == 'auto' and len(log['iterations']) >= squaring_threshold:
+                log['strategy'] = 'auto (squaring)'
+                return self._star_squaring(result, log)
+
+            t0 = perf_counter()
+            frontier = self.compose(frontier, prog) & ~result
+            result = result | frontier
+            self._log_iteration(log, result, t0, frontier)
+        return result
+
+    def _star_squaring(self, closure: BDD, log: dict) -> BDD:
+        """Squares a partial closure until it is stable.
+
+        Args:
+            closure (BDD): reflexive relation containing the program
+            log (dict): fixpoint log entry of the current star
+
+        Returns:
+            BDD: The reflexive transitive closure
+        """        
+        while True:
+            t0 = perf_counter()
+            new_closure = self.compose(closure, closure)
+            self._log_iteration(log, new_closure, t0)
+            if new_closure == closure:
+                return closure
+            closure = new_closure
+
+    def _log_iteration(self, log: dict, result: BDD, t0: float, frontier: BDD = None) -> None:
+        iteration = {'nodes': len(result), 'time': perf_counter() - t0}
+        if frontier is not None:
+            iteration['frontier_nodes'] = len(frontier)
+        log['iterations'].append(iteration)
 
     def parens(self, items: FormulaItems) -> BDD:
         return items[1]
@@ -221,21 +647,49 @@ class PDLTransformer(Transformer):
     def parens_prog(self, items: FormulaItems) -> BDD:
         return items[1]
 
-    def compose(self, first: BDD, second: BDD) -> BDD:
-        first_with_temp = self.model._add_temporary(first, is_primed=True)
-        second_with_temp = self.model._add_temporary(second, is_primed=False)
+    def compose(self, first: Program, second: Program) -> BDD:
+        """Returns the relational composition of two programs, for partitioned programs the union
+        of the compositions of their clusters. The intermediate states are restricted to the law,
+        the programs are only defined on it (they are restricted to the law).
 
-        compose = first_with_temp & second_with_temp
-        
-        temporary_variables = ([s for s in self.model.bdd.support(compose) if s.endswith("T")])
+        Args:
+            first (Program): the program taken first
+            second (Program): the program taken second
 
-        return self.model.bdd.exist(temporary_variables, compose)
+        Returns:
+            BDD: the composition as a relation over unprimed and primed variables
+        """        
+        if isinstance(first, PartitionedProgram) or isinstance(second, PartitionedProgram):
+            variables = self.model.registry.variables
+            firsts = PartitionedProgram.wrap(self.model.bdd, first).relations(variables)
+            seconds = PartitionedProgram.wrap(self.model.bdd, second).relations(variables)
+            firsts = [self.model._add_temporary(cluster, is_primed=True) for cluster in firsts]
+            seconds = [self.model._add_temporary(cluster, is_primed=False) & self.temporary_law for cluster in seconds]
+            result = self.model.bdd.false
+            for first_with_temp in firsts:
+                for second_with_temp in seconds:
+                    result |= self.backend.and_exists(first_with_temp, second_with_temp,
+                                                      self.model.registry.temporary_variables)
+            return result
+
+        first_with_temp = self.model._add_temporary(first, is_primed=True)
+        second_with_temp = self.model._add_temporary(second, is_primed=False) & self.temporary_law
+
+        return self.backend.and_exists(first_with_temp, second_with_temp,
+                                       self.model.registry.temporary_variables)
     
+    @property
+    def identity(self) -> BDD:
+        if self._identity is None:
+            self._identity = self.find_identity()
+        return self._identity
+
     def find_identity(self) -> BDD:
+        registry = self.model.registry
         identity = self.model.bdd.true
-        for proposition in self.model.bdd.support(self.model.law):
+        for proposition, primed_proposition in registry.prime_map.items():
             p = self.model.bdd.var(proposition)
-            p_prime = self.model._add_primes(p)
+            p_prime = self.model.bdd.var(primed_proposition)
             identity &= ~self.model.bdd.apply('xor', p, p_prime)
         return identity
     
@@ -0,0 +1,224 @@
+import dd.cudd as cudd
+from typing import Iterable, Optional, Union
+
+BDD = cudd.BDD
+# the variables a transition changes, None when the transition describes all primed variables
+Modified = Optional[frozenset[str]]
+
+# default maximum number of nodes of a cluster, neighbouring transitions are combined into one
+# cluster as long as it stays below this size
+CLUSTER_NODES = 1000
+
+
+def frame_condition(bdd: cudd.BDD, variables: Iterable[str]) -> BDD:
+    """Returns the frame condition x' <-> x for every variable, the variables a transition does
+    not change.
+
+    Args:
+        bdd (cudd.BDD): BDD manager
+        variables (Iterable[str]): unprimed variables
+
+    Returns:
+        BDD: the conjunction of the frame conditions
+    """
+    frame = bdd.true
+    for var in variables:
+        frame &= bdd.apply('<->', bdd.var(var + "'"), bdd.var(var))
+    return frame
+
+
+class PartitionedProgram:
+    def __init__(self, bdd: cudd.BDD, clusters: Iterable[BDD], modified: Optional[Iterable[Modified]] = None):
+        """A program stored as a disjunction of clusters, which is never built as one relation.
+
+        Every cluster is a relation over the unprimed and primed variables, and the program is
+        their union. Image computations distribute over the union, so the transformer computes
+        them per cluster and only has to quantify the variables a cluster depends on (see
+        PDLTransformer._preimage). The support of every cluster is computed once.
+
+        A cluster can be framed: it only describes the primed copies of the variables it 
+        modifies, every other variable keeps its value (x' <-> x). The frame condition is not 
+        part of the cluster BDD, images substitute the unchanged variables instead, and it is 
+        only conjoined when the cluster is needed as a relation (see relations).
+
+        Args:
+            bdd (cudd.BDD): BDD manager of the clusters
+            clusters (Iterable[BDD]): the clusters, false clusters are left out
+            modified (Optional[Iterable[Modified]], optional): per cluster the unprimed variables
+            it modifies, or None for a cluster that describes all primed variables. Defaults to
+            None, no framed clusters.
+        """
+        self.bdd = bdd
+        clusters = list(clusters)
+        modified = [None] * len(clusters) if modified is None else list(modified)
+        kept = [index for index, cluster in enumerate(clusters) if cluster != bdd.false]
+        self.clusters = [clusters[index] for index in kept]
+        self.modified = [modified[index] for index in kept]
+        self.supports = [frozenset(bdd.support(cluster)) for cluster in self.clusters]
+
+    @classmethod
+    def from_transitions(cls, bdd: cudd.BDD, transitions: Iterable[BDD],
+                         max_nodes: Optional[int] = CLUSTER_NODES,
+                         modified: Optional[Iterable[Modified]] = None) -> "PartitionedProgram":
+        """Groups transitions into clusters. Neighbouring transitions are combined as long as the
+        cluster stays below max_nodes nodes, so small programs end up as one cluster. When two
+        framed transitions are combined, each gets the frame conditions of the variables only 
+        the other one modifies.
+
+        Args:
+            bdd (cudd.BDD): BDD manager of the transitions
+            transitions (Iterable[BDD]): the transitions (or groups of transitions) in input order
+            max_nodes (Optional[int], optional): maximum number of nodes of a combined cluster, 0
+            for a cluster per transition and None for a single cluster. Defaults to CLUSTER_NODES.
+            modified (Optional[Iterable[Modified]], optional): the variables every transition 
+            modifies, see __init__. Defaults to None, no framed transitions.
+
+        Returns:
+            PartitionedProgram: the program
+        """
+        transitions = list(transitions)
+        modified = [None] * len(transitions) if modified is None else list(modified)
+        clusters, cluster_modified = [], []
+        for transition, transition_modified in zip(transitions, modified):
+            # a framed transition is not combined with one over all primed variables, that would
+            # need the frame of every variable the framed transition does not modify
+            if clusters and (cluster_modified[-1] is None) == (transition_modified is None):
+                combined, combined_modified = cls._combine(bdd, clusters[-1], cluster_modified[-1],
+                                                           transition, transition_modified)
+                if max_nodes is None or len(combined) <= max_nodes:
+                    clusters[-1], cluster_modified[-1] = combined, combined_modified
+                    continue
+            clusters.append(transition)
+            cluster_modified.append(transition_modified)
+        return cls(bdd, clusters, cluster_modified)
+
+    @staticmethod
+    def _combine(bdd: cudd.BDD, first: BDD, first_modified: Modified, second: BDD,
+                 second_modified: Modified) -> tuple[BDD, Modified]:
+        if first_modified is None:
+            return first | second, None
+        first = first & frame_condition(bdd, second_modified - first_modified)
+        second = second & frame_condition(bdd, first_modified - second_modified)
+        return first | second, first_modified | second_modified
+
+    @classmethod
+    def wrap(cls, bdd: cudd.BDD, program: Union[BDD, "PartitionedProgram"]) -> "PartitionedProgram":
+        """Returns the program as a PartitionedProgram, a BDD becomes a single cluster."""
+        if isinstance(program, PartitionedProgram):
+            return program
+        return cls(bdd, [program])
+
+    def with_transition(self, transition: BDD, modified: Modified = None,
+                        max_nodes: Optional[int] = CLUSTER_NODES) -> "PartitionedProgram":
+        """Returns the program with one more transition. Like in from_transitions it is combined 
+        with the last cluster while that stays below max_nodes nodes, otherwise it becomes a new
+        cluster.
+
+        Args:
+            transition (BDD): the transition
+            modified (Modified, optional): the variables the transition modifies, see __init__. 
+            Defaults to None.
+            max_nodes (Optional[int], optional): maximum number of nodes of a combined cluster.
+            Defaults to CLUSTER_NODES.
+
+        Returns:
+            PartitionedProgram: the new program
+        """
+        if self.clusters and (self.modified[-1] is None) == (modified is None):
+            combined, combined_modified = self._combine(self.bdd, self.clusters[-1], self.modified[-1],
+                                                        transition, modified)
+            if max_nodes is None or len(combined) <= max_nodes:
+                return PartitionedProgram(self.bdd, self.clusters[:-1] + [combined],
+                                          self.modified[:-1] + [combined_modified])
+        return PartitionedProgram(self.bdd, self.clusters + [transition], self.modified + [modified])
+
+    def without(self, relation: BDD, variables: Iterable[str]) -> "PartitionedProgram":
+        """Returns the program without the transitions of a relation. The unchanged variables of
+        a framed cluster equal their primed copies, so the relation is read with the unprimed 
+        copies there.
+
+        Args:
+            relation (BDD): transitions over all unprimed and primed variables
+            variables (Iterable[str]): all unprimed variables of the model
+
+        Returns:
+            PartitionedProgram: the new program, clusters that become empty are left out
+        """
+        variables = frozenset(variables)
+        clusters = []
+        for cluster, modified in zip(self.clusters, self.modified):
+            removed = relation
+            if modified is not None and variables - modified:
+                # a substitution, the relation depends on the unprimed copies as well
+                removed = self.bdd.let({var + "'": self.bdd.var(var) for var in variables - modified}, relation)
+            clusters.append(cluster & ~removed)
+        return PartitionedProgram(self.bdd, clusters, self.modified)
+
+    def relations(self, variables: Iterable[str]) -> list[BDD]:
+        """Returns the clusters as relations, with the frame conditions of framed clusters.
+
+        Args:
+            variables (Iterable[str]): all unprimed variables of the model
+
+        Returns:
+            list[BDD]: the clusters as relations over unprimed and primed variables
+        """
+        variables = frozenset(variables)
+        return [cluster if modified is None else cluster & frame_condition(self.bdd, variables - modified)
+                for cluster, modified in zip(self.clusters, self.modified)]
+
+    def relation(self, variables: Iterable[str]) -> BDD:
+        """Returns the union of the clusters as one relation, for operations on relations such as
+        a test of equality.
+
+        Args:
+            variables (Iterable[str]): all unprimed variables of the model
+
+        Returns:
+            BDD: the program as a relation over unprimed and primed variables
+        """
+        result = self.bdd.false
+        for cluster in self.relations(variables):
+            result |= cluster
+        return result
+
+    def map(self, function) -> "PartitionedProgram":
+        """Returns a program with the function applied to every cluster, for operations that
+        distribute over the union and keep the modified variables (restriction to a care set 
+        over the unprimed variables).
+
+        Args:
+            function (Callable[[BDD], BDD]): operation on a cluster
+
+        Returns:
+            PartitionedProgram: the new program
+        """
+        return PartitionedProgram(self.bdd, [function(cluster) for cluster in self.clusters], self.modified)
+
+    def union(self, other: Union[BDD, "PartitionedProgram"]) -> "PartitionedProgram":
+        """Returns the union with another program, whose clusters are added to these.
+
+        Args:
+            other (Union[BDD, PartitionedProgram]): the other program
+
+        Returns:
+            PartitionedProgram: the union
+        """
+        other = PartitionedProgram.wrap(self.bdd, other)
+        return PartitionedProgram(self.bdd, self.clusters + other.clusters, self.modified + other.modified)
+
+    def support(self) -> set[str]:
+        """Returns the variables the clusters depend on, without the frame conditions."""
+        return set().union(*self.supports)
+
+    def __len__(self) -> int:
+        return sum(len(cluster) for cluster in self.clusters)
+
+    # programs with the same clusters are equal, so results cached per program (closures) are 
+    # found again for a program that is rebuilt, for instance the union in (a U b)*
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, PartitionedProgram) and self.clusters == other.clusters 
+                and self.modified == other.modified)
+
+    def __hash__(self) -> int:
+        return hash((tuple(self.clusters), tuple(self.modified)))
@@ -0,0 +1,217 @@
+import json
+import os
+import warnings
+from time import perf_counter, process_time
+from typing import Callable, Optional
+
+from QueryPlan import PlanNode, plan_text
+
+# methods of PDLTransformer that are timed when a profiler is attached, with the category of their
+# spans in the trace
+TRANSFORMER_HELPERS = {
+    'evaluate_expression': 'formula',
+    'compile': 'parse',
+    'compose': 'relation',
+    '_build_closure': 'fixpoint',
+    '_reachability_fixpoint': 'fixpoint',
+    '_preimage': 'image',
+    '_postimage': 'image',
+}
+# methods of the model that are timed when a profiler is attached
+MODEL_HELPERS = {
+    '_add_primes': 'rename',
+    '_add_temporary': 'rename',
+}
+
+
+class Profiler:
+    def __init__(self, model):
+        """Opt-in instrumentation of the checks on a model.
+
+        While the profiler is attached, every rule that evaluates a plan node and the helpers in
+        TRANSFORMER_HELPERS and MODEL_HELPERS record a span with their wall and CPU time, the
+        number of nodes of their result and, for fixpoints, the number of iterations. Every
+        formula records the live and peak nodes of the BDD manager, and cache hits are counted
+        per plan node. The spans are exported as a Chrome trace (chrome://tracing, Perfetto or
+        speedscope show it as a flame graph) and summarized per formula by report().
+
+        Attaching replaces the helpers by timed wrappers on the transformer and model instances
+        and detaching removes them again, so a model without a profiler runs the unwrapped
+        methods. Measuring the size of every result takes time linear in its number of nodes,
+        so the profiled times are somewhat higher than the unprofiled ones.
+
+        Args:
+            model (Union[SymbolicModel, ExplicitSymbolicModel]): the model whose checks are
+            profiled
+        """
+        self.model = model
+        self.transformer = model.transformer
+        self.events = []
+        self.cache_hits = {}
+        self.formulas = []
+        self._origin = perf_counter()
+        self._children_time = []
+        self._wrapped = []
+        self._texts = {}
+        # index in self.formulas of the formula being checked, None outside a check
+        self._formula = None
+
+    def attach(self) -> "Profiler":
+        if self._wrapped:
+            return self
+        for owner, helpers in ((self.transformer, TRANSFORMER_HELPERS), (self.model, MODEL_HELPERS)):
+            for method, category in helpers.items():
+                self._wrap(owner, method, category)
+        self.transformer.profiler = self
+        return self
+
+    def detach(self) -> None:
+        for owner, method in self._wrapped:
+            delattr(owner, method)
+        self._wrapped = []
+        self.transformer.profiler = None
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.detach()
+
+    def _wrap(self, owner, method: str, category: str) -> None:
+        function = getattr(owner, method)
+
+        def timed(*args, **kwargs):
+            name = args[0] if category == 'formula' else method
+            return self._span(name, category, function, args, kwargs)
+
+        setattr(owner, method, timed)
+        self._wrapped.append((owner, method))
+
+    def rule(self, node: PlanNode, rule: Callable, items: list):
+        """Evaluates a plan node with its rule in a span, called by PDLTransformer.evaluate_plan."""
+        if node not in self._texts:
+            self._texts[node] = plan_text(node)
+        return self._span(self._texts[node], 'plan', rule, (items,), {}, {'op': node.op})
+
+    def cache_hit(self, node: PlanNode) -> None:
+        """Counts a result of a plan node that was found in the subformula cache."""
+        if node not in self._texts:
+            self._texts[node] = plan_text(node)
+        key = (self._formula, self._texts[node])
+        self.cache_hits[key] = self.cache_hits.get(key, 0) + 1
+
+    def _span(self, name: str, category: str, function: Callable, args: tuple, kwargs: dict,
+              span_args: Optional[dict] = None):
+        outer_formula = self._formula
+        if category == 'formula':
+            self._formula = len(self.formulas)
+            self.formulas.append({'formula': name, 'live_nodes_before': len(self.model.bdd),
+                                  'peak_nodes_before': self._peak_nodes()})
+        formula = self._formula
+        fixpoint_logs = len(self.transformer.fixpoint_log)
+        self._children_time.append(0.0)
+        start, start_cpu = perf_counter(), process_time()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            duration, cpu = perf_counter() - start, process_time() - start_cpu
+            children_time = self._children_time.pop()
+            self._formula = outer_formula
+            if self._children_time:
+                self._children_time[-1] += duration
+
+        event = {'name': name, 'category': category, 'formula': formula, 'start': start - self._origin,
+                 'duration': duration, 'self_duration': duration - children_time, 'cpu': cpu,
+                 'nodes': self._nodes(result), **(span_args or {})}
+        if category == 'fixpoint':
+            event['iterations'] = sum(len(log['iterations'])
+                                      for log in self.transformer.fixpoint_log[fixpoint_logs:])
+        if category == 'formula':
+            self.formulas[formula].update({'live_nodes_after': len(self.model.bdd), 'peak_nodes_after': self._peak_nodes(),
+                                           'duration': duration, 'cpu': cpu, 'nodes': event['nodes']})
+            event['live_nodes'] = self.formulas[formula]['live_nodes_after']
+        self.events.append(event)
+        return result
+
+    @staticmethod
+    def _nodes(result) -> Optional[int]:
+        # a Closure is measured by the program it iterates, like in SubformulaCache
+        result = getattr(result, 'program', result)
+        try:
+            return len(result)
+        except TypeError:
+            return None
+
+    def _peak_nodes(self) -> Optional[int]:
+        try:
+            with warnings.catch_warnings():
+                # dd warns about a changed unit of a statistic that is not used here
+                warnings.simplefilter('ignore')
+                return self.model.bdd.statistics().get('peak_live_nodes')
+        except (AttributeError, NotImplementedError):
+            return None
+
+    def trace(self) -> dict:
+        """Returns the spans in the Chrome trace event format, as complete events with times in
+        microseconds, and the live nodes after every formula as a counter."""
+        pid = os.getpid()
+        events = []
+        for event in self.events:
+            args = {key: value for key, value in event.items()
+                    if key not in ('name', 'category', 'start', 'duration') and value is not None}
+            events.append({'name': event['name'], 'cat': event['category'], 'ph': 'X', 'pid': pid, 'tid': 0,
+                           'ts': event['start'] * 1e6, 'dur': event['duration'] * 1e6, 'args': args})
+            if event['category'] == 'formula':
+                events.append({'name': 'live nodes', 'ph': 'C', 'pid': pid, 'tid': 0,
+                               'ts': (event['start'] + event['duration']) * 1e6, 'args': {'nodes': event['live_nodes']}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, file_name: str) -> None:
+        with open(file_name, 'w') as f:
+            json.dump(self.trace(), f)
+
+    def report(self) -> str:
+        """Returns a per formula breakdown: the time, result size and BDD manager nodes of the
+        formula, then every evaluated plan node and every helper with its number of calls, total
+        and self time (without the time of the spans inside it), result nodes of the last call,
+        fixpoint iterations and cache hits.
+
+        Returns:
+            str: the breakdown
+        """
+        lines = []
+        for index, formula in enumerate(self.formulas):
+            if 'duration' not in formula:
+                continue
+            peak = formula['peak_nodes_after']
+            peak_text = '' if peak is None else f", peak live nodes {peak}" + \
+                (' (new peak)' if peak > formula['peak_nodes_before'] else '')
+            lines.append(f"Profile of {formula['formula']}: {formula['duration']:.3e} seconds "
+                         f"({formula['cpu']:.3e} CPU), result {formula['nodes']} nodes, "
+                         f"live nodes {formula['live_nodes_before']} -> {formula['live_nodes_after']}{peak_text}")
+            lines.append(f"  {'span':<40} {'calls':>6} {'total':>10} {'self':>10} {'nodes':>8} {'iters':>6} {'hits':>5}")
+            rows = {}
+            for event in self.events:
+                if event['formula'] != index or event['category'] == 'formula':
+                    continue
+                row = rows.setdefault((event['category'], event['name']),
+                                      {'calls': 0, 'total': 0.0, 'self': 0.0, 'nodes': None, 'iterations': 0})
+                row['calls'] += 1
+                row['total'] += event['duration']
+                row['self'] += event['self_duration']
+                row['nodes'] = event['nodes']
+                row['iterations'] += event.get('iterations', 0)
+            for (formula_index, text), hits in self.cache_hits.items():
+                if formula_index == index:
+                    rows.setdefault(('plan', text), {'calls': 0, 'total': 0.0, 'self': 0.0, 'nodes': None, 'iterations': 0})
+            order = sorted(rows.items(), key=lambda item: (item[0][0] != 'plan', -item[1]['total']))
+            for (category, name), row in order:
+                label = name if len(name) <= 38 else name[:35] + '...'
+                label = label if category == 'plan' else f'[{label}]'
+                nodes = '' if row['nodes'] is None else row['nodes']
+                iterations = row['iterations'] or ''
+                hits = self.cache_hits.get((index, name), '') if category == 'plan' else ''
+                # a plan node that was only found in the cache has no calls
+                times = f"{row['total']:>10.3e} {row['self']:>10.3e}" if row['calls'] else f"{'':>10} {'':>10}"
+                lines.append(f"  {label:<40} {row['calls']:>6} {times} {nodes:>8} {iterations:>6} {hits:>5}")
+        return '\n'.join(lines)
@@ -0,0 +1,289 @@
+from collections import OrderedDict
+from lark import Token, Transformer_NonRecursive
+import dd.cudd as _bdd
+
+from typing import Optional, Union
+
+BDD = _bdd.BDD
+
+# rules that only group a subterm, they are left out of the plan
+TRANSPARENT_RULES = {'parens': 1, 'parens_prog': 1}
+# rules of the form [left, operator, right] where the order of left and right does not matter
+COMMUTATIVE_RULES = {'and_', 'or_', 'choice'}
+# rules whose result depends on the law: modalities conjoin the primed law, compositions restrict
+# their intermediate states to it
+LAW_RULES = {'diamond', 'box', 'seq', 'star'}
+# rules that plan_text writes as infix operators
+BINARY_OPERATORS = {'and_', 'or_', 'implies', 'equiv', 'seq', 'choice'}
+
+
+class PlanNode:
+    def __init__(self, op: str, items: tuple):
+        """A node in a compiled PDL query plan.
+
+        Nodes are hash-consed by PlanCompiler, so two structurally equal subterms are always the
+        same node object and nodes can be compared and hashed by identity. The names of the 
+        programs and propositions the subterm uses and whether it depends on the law are derived
+        from the children, so cached results can be invalidated when the model is edited.
+
+        Args:
+            op (str): name of the PDLTransformer rule that evaluates this node
+            items (tuple): the items passed to that rule, either PlanNodes or operator tokens as
+            strings
+        """
+        self.op = op
+        self.items = items
+        children = self.children()
+        programs = {items[0]} if op == 'program_symbol' else set()
+        self.programs = frozenset(programs.union(*(child.programs for child in children)))
+        propositions = {items[0]} if op == 'formula_symbol' else set()
+        self.propositions = frozenset(propositions.union(*(child.propositions for child in children)))
+        self.uses_law = op in LAW_RULES or any(child.uses_law for child in children)
+
+    def children(self) -> list["PlanNode"]:
+        return [item for item in self.items if isinstance(item, PlanNode)]
+
+    def __repr__(self) -> str:
+        return f'PlanNode({self.op}, {self.items})'
+
+
+def plan_text(node: PlanNode) -> str:
+    """Writes a plan node back as a PDL formula or program, with compound operands in
+    parentheses.
+
+    Args:
+        node (PlanNode): node of a compiled query plan
+
+    Returns:
+        str: the formula or program
+    """
+    def operand(item: PlanNode) -> str:
+        text = plan_text(item)
+        return f'({text})' if item.op in BINARY_OPERATORS else text
+
+    items = node.items
+    if node.op in ('formula_symbol', 'program_symbol'):
+        return items[0]
+    if node.op in BINARY_OPERATORS:
+        return f'{operand(items[0])} {items[1]} {operand(items[2])}'
+    if node.op == 'not_':
+        return items[0] + operand(items[1])
+    if node.op in ('test', 'star'):
+        return operand(items[0]) + items[1]
+    if node.op == 'diamond':
+        return f'<{plan_text(items[0])}>{operand(items[1])}'
+    if node.op == 'box':
+        return f'[{plan_text(items[0])}]{operand(items[1])}'
+    raise ValueError(f'Unknown plan operator {node.op}')
+
+
+class PlanCompiler(Transformer_NonRecursive):
+    def __init__(self):
+        """Compiles lark parse trees of PDL formulas into a DAG of PlanNodes.
+
+        Every subterm is normalized (grouping parentheses are dropped and the operands of
+        commutative operators are ordered) and interned in a table, so equal subterms of all
+        formulas compiled by the same compiler share one node. Compiled plans can be rewritten
+        with rewrite, which moves the modalities inwards.
+        """
+        super().__init__()
+        self.nodes = {}
+        self.rewritten = {}
+
+    def __default__(self, data: str, children: list, meta) -> PlanNode:
+        if data in TRANSPARENT_RULES:
+            return children[TRANSPARENT_RULES[data]]
+        return self.node(data, [str(child) if isinstance(child, Token) else child for child in children])
+
+    def node(self, op: str, items: list) -> PlanNode:
+        """Returns the interned node of a rule with the given items.
+
+        Args:
+            op (str): name of the PDLTransformer rule
+            items (list): PlanNodes and operator tokens as strings
+
+        Returns:
+            PlanNode: the node, shared with every equal node compiled before
+        """
+        items = list(items)
+        if op in COMMUTATIVE_RULES and id(items[2]) < id(items[0]):
+            items[0], items[2] = items[2], items[0]
+
+        key = (op, tuple(id(item) if isinstance(item, PlanNode) else item for item in items))
+        node = self.nodes.get(key)
+        if node is None:
+            node = PlanNode(op, tuple(items))
+            self.nodes[key] = node
+        return node
+
+    def rewrite(self, plan: PlanNode) -> PlanNode:
+        """Pushes the modalities of a plan through tests, sequences and choices:
+
+            <f?>g -> f & g          [f?]g -> f -> g
+            <a;b>g -> <a><b>g       [a;b]g -> [a][b]g
+            <a U b>g -> <a>g | <b>g [a U b]g -> [a]g & [b]g
+            <(f?)*>g -> g           [(f?)*]g -> g
+
+        Afterwards every modality has an atomic or iterated program, so tests are evaluated as
+        sets of states and no composition or union is built as a relation, except for what
+        remains inside iterations, such as (a;b)*. The rewritten formula is equivalent within
+        the law: a modality only reaches states of the law. Plans are rewritten bottom-up 
+        without recursion over the formula, and rewritten nodes are kept, so every node is 
+        rewritten once per compiler.
+
+        Args:
+            plan (PlanNode): root of a compiled plan
+
+        Returns:
+            PlanNode: the root of the rewritten plan
+        """
+        stack = [(plan, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if node in self.rewritten:
+                continue
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+                continue
+
+            items = [self.rewritten[item] if isinstance(item, PlanNode) else item for item in node.items]
+            if node.op in ('diamond', 'box'):
+                result = self._push_modality(node.op, items[0], items[1])
+            else:
+                result = self.node(node.op, items)
+            self.rewritten[node] = result
+            self.rewritten.setdefault(result, result)
+        return self.rewritten[plan]
+
+    def _push_modality(self, op: str, program: PlanNode, formula: PlanNode) -> PlanNode:
+        # a sequence is pushed from its last program backwards, so only choices within sequences
+        # (which need parentheses) recurse
+        programs = []
+        stack = [program]
+        while stack:
+            item = stack.pop()
+            if item.op == 'seq':
+                stack.extend((item.items[2], item.items[0]))
+            else:
+                programs.append(item)
+
+        for item in reversed(programs):
+            if item.op == 'test':
+                formula = self.node('and_' if op == 'diamond' else 'implies',
+                                    [item.items[0], '&' if op == 'diamond' else '->', formula])
+            elif item.op == 'star' and item.items[0].op == 'test':
+                continue
+            elif item.op == 'choice':
+                alternatives = []
+                stack = [item]
+                while stack:
+                    alternative = stack.pop()
+                    if alternative.op == 'choice':
+                        stack.extend((alternative.items[2], alternative.items[0]))
+                    else:
+                        alternatives.append(self._push_modality(op, alternative, formula))
+                formula = alternatives[0]
+                for alternative in alternatives[1:]:
+                    formula = self.node('or_' if op == 'diamond' else 'and_',
+                                        [formula, '|' if op == 'diamond' else '&', alternative])
+            else:
+                formula = self.node(op, [item, formula])
+        return formula
+
+
+class SubformulaCache:
+    # approximate number of bytes CUDD uses for one node
+    BYTES_PER_NODE = 32
+    # limit for managers that do not report their memory limits (sylvan, autoref)
+    DEFAULT_MAX_NODES = 1 << 22
+
+    def __init__(self, bdd: _bdd.BDD, max_nodes: Optional[int] = None):
+        """A size bounded memo table from PlanNodes to their evaluated result.
+
+        The size of the cache is measured in BDD nodes. When it grows over max_nodes the least
+        recently used results are evicted, except for results that are pinned with a positive
+        reference count (for instance while the formula using them is being evaluated).
+
+        Args:
+            bdd (_bdd.BDD): the BDD manager the results belong to
+            max_nodes (Optional[int], optional): maximum number of BDD nodes kept in the cache.
+            Defaults to a quarter of the nodes CUDD may allocate (the smaller of its memory
+            limit and its unique table growth limit), or DEFAULT_MAX_NODES for other backends.
+        """
+        if max_nodes is None:
+            config = bdd.configure()
+            if config.get('max_memory') and config.get('loose_up_to'):
+                max_nodes = min(config['max_memory'] // self.BYTES_PER_NODE, config['loose_up_to']) // 4
+            else:
+                max_nodes = self.DEFAULT_MAX_NODES
+        self.max_nodes = max_nodes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.refcounts = {}
+        self.num_nodes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node: PlanNode) -> Union[BDD, object, None]:
+        result = self.entries.get(node)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(node)
+        return result
+
+    def put(self, node: PlanNode, result: Union[BDD, object]) -> None:
+        if node in self.entries:
+            return
+        size = self._size(result)
+        self.entries[node] = result
+        self.sizes[node] = size
+        self.num_nodes += size
+        self._evict()
+
+    def pin(self, node: PlanNode) -> None:
+        self.refcounts[node] = self.refcounts.get(node, 0) + 1
+
+    def unpin(self, node: PlanNode) -> None:
+        self.refcounts[node] -= 1
+        if self.refcounts[node] == 0:
+            del self.refcounts[node]
+        self._evict()
+
+    def invalidate(self, predicate) -> int:
+        """Removes the results of the nodes for which the predicate holds, pinned or not.
+
+        Args:
+            predicate (Callable[[PlanNode], bool]): whether the result of a node is invalid
+
+        Returns:
+            int: the number of removed results
+        """
+        stale = [node for node in self.entries if predicate(node)]
+        for node in stale:
+            del self.entries[node]
+            self.num_nodes -= self.sizes.pop(node)
+        return len(stale)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.sizes.clear()
+        self.num_nodes = 0
+
+    def _evict(self) -> None:
+        if self.num_nodes <= self.max_nodes:
+            return
+        for node in list(self.entries):
+            if self.num_nodes <= self.max_nodes:
+                break
+            if node in self.refcounts:
+                continue
+            del self.entries[node]
+            self.num_nodes -= self.sizes.pop(node)
+
+    @staticmethod
+    def _size(result: Union[BDD, object]) -> int:
+        # a Closure is measured by the program it iterates
+        return len(getattr(result, 'program', result))
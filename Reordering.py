@@ -0,0 +1,123 @@
+import warnings
+import dd.cudd as cudd
+from Backend import backend_of
+from time import perf_counter
+from typing import Optional
+
+# 'off': no reordering
+# 'sift': CUDD's automatic group sifting, triggered by CUDD when the number of nodes has grown
+# 'once': one group sifting after the model is constructed, no reordering afterwards
+# 'threshold': group sifting before a check when the number of live nodes exceeds a threshold,
+#   after which the threshold is raised to twice the number of nodes that are left
+REORDERING_PROFILES = ('off', 'sift', 'once', 'threshold')
+
+
+class ReorderingControl:
+    def __init__(self, bdd: cudd.BDD, profile: Optional[str] = None, threshold: int = 100_000,
+                 max_growth: Optional[float] = None, max_swaps: Optional[int] = None,
+                 max_vars: Optional[int] = None):
+        """Controls the dynamic variable reordering of the BDD manager of a model.
+
+        The profile only takes effect when start() is called, so the bulk construction of a model
+        can run without reordering. Every check is logged in self.log with the number of
+        reorderings, the time spent reordering and the number of live nodes before and after.
+        Reordering needs a backend with dynamic reordering (cudd), on other backends only the
+        profile 'off' (or None) is accepted and the number of live nodes is logged.
+
+        Args:
+            bdd (cudd.BDD): BDD manager of the model
+            profile (Optional[str], optional): One of REORDERING_PROFILES, or None to keep the
+            reordering setting of the manager. Defaults to None.
+            threshold (int, optional): number of live nodes that triggers a reordering with the
+            'threshold' profile. Defaults to 100_000.
+            max_growth (Optional[float], optional): factor by which the number of nodes may grow
+            while a variable is sifted. Defaults to CUDD's setting.
+            max_swaps (Optional[int], optional): maximum number of swaps in one sifting. Defaults
+            to CUDD's setting.
+            max_vars (Optional[int], optional): maximum number of variables sifted in one sifting.
+            Defaults to CUDD's setting.
+
+        Raises:
+            ValueError: Unknown profile, or a reordering profile on a backend without dynamic
+            reordering
+        """
+        if profile is not None and profile not in REORDERING_PROFILES:
+            raise ValueError(f'Unknown reordering profile {profile}, expected one of {REORDERING_PROFILES}')
+        self.bdd = bdd
+        self.profile = profile
+        self.threshold = threshold
+        self.log = []
+        self.backend = backend_of(bdd)
+
+        limits = {'max_growth': max_growth, 'max_swaps': max_swaps, 'max_vars': max_vars}
+        limits = {key: value for key, value in limits.items() if value is not None}
+        if not self.backend.dynamic_reordering:
+            if profile not in (None, 'off') or limits:
+                raise ValueError(f'The {self.backend.name} backend does not support dynamic reordering')
+            self._initial_reordering = False
+            return
+        self.bdd.configure(**limits)
+
+        # the setting of the manager when it was handed to the model, used when profile is None
+        self._initial_reordering = self.bdd.configure(reordering=False)['reordering']
+
+    def group(self, groups: list[list[str]]) -> None:
+        """Couples variables that should always stay next to each other, such as a variable and
+        its primed and temporary copy. Groups that are not at adjacent levels are skipped.
+
+        Args:
+            groups (list[list[str]]): lists of variables
+        """
+        if not self.backend.dynamic_reordering:
+            return
+        for group in groups:
+            levels = sorted(self.bdd.level_of_var(var) for var in group)
+            if len(group) > 1 and levels[-1] - levels[0] == len(group) - 1:
+                top = min(group, key=self.bdd.level_of_var)
+                self.bdd.group({top: len(group)})
+
+    def start(self) -> None:
+        """Switches to the profile, to be called once the model is constructed."""
+        if not self.backend.dynamic_reordering:
+            return
+        if self.profile is None:
+            self.bdd.configure(reordering=self._initial_reordering)
+        elif self.profile == 'sift':
+            self.bdd.configure(reordering=True)
+        elif self.profile == 'once':
+            self.reorder('construction')
+
+    def reorder(self, reason: str) -> None:
+        """Runs one group sifting and logs its effect.
+
+        Args:
+            reason (str): what triggered the reordering, stored in the log
+        """
+        nodes_before = len(self.bdd)
+        t0 = perf_counter()
+        self.bdd.reorder()
+        self.log.append({'event': 'reorder', 'reason': reason, 'time': perf_counter() - t0,
+                         'nodes_before': nodes_before, 'nodes_after': len(self.bdd)})
+
+    def before_check(self, formula: str) -> None:
+        if self.profile == 'threshold' and len(self.bdd) > self.threshold:
+            self.reorder(formula)
+            self.threshold = max(self.threshold, 2 * len(self.bdd))
+        self._check_start = (len(self.bdd), *self._reordering_statistics())
+
+    def after_check(self, formula: str) -> None:
+        nodes_before, reorderings_before, time_before = self._check_start
+        reorderings, reordering_time = self._reordering_statistics()
+        self.log.append({'event': 'check', 'formula': formula,
+                         'reorderings': reorderings - reorderings_before,
+                         'reordering_time': reordering_time - time_before,
+                         'nodes_before': nodes_before, 'nodes_after': len(self.bdd)})
+
+    def _reordering_statistics(self) -> tuple[int, float]:
+        if not self.backend.dynamic_reordering:
+            return 0, 0.0
+        with warnings.catch_warnings():
+            # dd warns about a changed unit of a statistic that is not used here
+            warnings.simplefilter('ignore')
+            statistics = self.bdd.statistics()
+        return statistics['n_reorderings'], statistics['reordering_time']
@@ -1,20 +1,77 @@
 import numpy as np
 import dd.cudd as cudd
+from typing import Optional
+from PartitionedProgram import CLUSTER_NODES, PartitionedProgram
 
 def map_new_variable_names(expression: str, mapping: dict[str, str]) -> str:
     for orig_name, new_name in mapping.items():
         expression = expression.replace(orig_name, new_name)
     return expression
 
-def SymbolicModelFromSymbolic(file: str) -> tuple[cudd.BDD, list[str], cudd.BDD, dict[str, cudd.BDD], list[str]]:
-    components = ['PROPS', 'LAW', 'PROGRAMS', 'TESTS']
+def split_modified_variables(line: str, mapping: dict[str, str], variables: list[str]) -> tuple[Optional[frozenset[str]], str]:
+    """Splits a transition line into the variables it modifies and its expression.
+
+    A transition can start with the set of variables it changes, as in `{p, q} p & q' & !p'`.
+    Every other variable keeps its value (an implicit p' <-> p), so the expression only has to
+    describe the primed copies of the listed variables.
+
+    Args:
+        line (str): transition line of the PROGRAMS section
+        mapping (dict[str, str]): the renaming of the declared variable names
+        variables (list[str]): the declared (renamed) variables
+
+    Raises:
+        ValueError: The set is not closed or lists a variable that is not declared
+
+    Returns:
+        tuple[Optional[frozenset[str]], str]: the modified variables, None for a line without a
+        set, and the expression
+    """
+    if not line.startswith('{'):
+        return None, line
+    end = line.find('}')
+    if end == -1:
+        raise ValueError(f'Set of modified variables is not closed in transition ({line})')
+    names = [name.strip() for name in line[1:end].split(',') if name.strip()]
+    modified = frozenset(mapping.get(name, name) for name in names)
+    undeclared = modified - set(variables)
+    if undeclared:
+        raise ValueError(f'Modified variables {sorted(undeclared)} of transition ({line}) are not declared in VARS section ({variables})')
+    return modified, line[end + 1:]
+
+def check_modified_variables(bdd: cudd.BDD, transition: cudd.BDD, modified: frozenset[str], description: str) -> None:
+    """Checks that a framed transition only describes the primed copies of the variables it 
+    modifies.
+
+    Args:
+        bdd (cudd.BDD): BDD manager of the transition
+        transition (cudd.BDD): the transition
+        modified (frozenset[str]): the variables the transition modifies
+        description (str): the transition as written, for the error message
+
+    Raises:
+        ValueError: The transition mentions a primed variable outside the modified variables
+    """
+    unlisted = {var[:-1] for var in bdd.support(transition) if var.endswith("'")} - modified
+    if unlisted:
+        raise ValueError(f'Transition ({description}) changes variables {sorted(unlisted)} that are not in its set of modified variables')
+
+def SymbolicModelFromSymbolic(file: str, bdd: Optional[cudd.BDD] = None, cluster_nodes: Optional[int] = CLUSTER_NODES) -> tuple[cudd.BDD, list[str], cudd.BDD, dict[str, PartitionedProgram], list[str], list[set[str]], Optional[cudd.BDD]]:
+    components = ['PROPS', 'LAW', 'INIT', 'PROGRAMS', 'TESTS']
     mode = None
     variables = []
     mapping_variable_names = {}
     programs = {}
+    # per program the variables every transition modifies, None for a transition without a set
+    program_modified = {}
     law = None
-    bdd = cudd.BDD()
+    # the initial states, every line of the INIT section adds states
+    init = None
+    if bdd is None:
+        bdd = cudd.BDD()
     tests = []
+    # the support of the law and of every transition, from which a variable order can be derived
+    dependencies = []
 
     with open(file, 'r') as f:
         line = f.readline()
@@ -35,7 +92,9 @@ def SymbolicModelFromSymbolic(file: str) -> tuple[cudd.BDD, list[str], cudd.BDD,
                     else:
                         mapping_variable_names[variables[i]] = variables[i]
 
-                    bdd.declare(variables[i], variables[i]+"'")
+                    # the temporary copy is declared here as well, so on a backend with a static
+                    # variable order (sylvan) the copies of a variable are interleaved
+                    bdd.declare(variables[i], variables[i]+"'", variables[i]+'T')
 
                 line = f.readline()
             elif mode == 'LAW':
@@ -51,20 +110,38 @@ def SymbolicModelFromSymbolic(file: str) -> tuple[cudd.BDD, list[str], cudd.BDD,
                             raise RuntimeError(f'Invalid character/operator used in law ({line})') from e
                         else:
                             raise Exception(f'Unexpected error during the creation of the law: {e}') from e
+                    dependencies.append(bdd.support(law))
                     
                 line = f.readline()
 
+            elif mode == 'INIT':
+                init_expr = map_new_variable_names(line, mapping_variable_names)
+                try:
+                    new_init = bdd.add_expr(init_expr)
+                except Exception as e:
+                    if isinstance(e, ValueError):
+                        raise ValueError(f'Variable used in initial states ({line}) that is not declared in VARS section ({variables})') from e
+                    elif isinstance(e, RuntimeError):
+                        raise RuntimeError(f'Invalid character/operator used in initial states ({line})') from e
+                    else:
+                        raise Exception(f'Unexpected error during the creation of the initial states: {e}') from e
+                init = new_init if init is None else init | new_init
+
+                line = f.readline()
+
             elif mode == 'PROGRAMS':
                 if line.split():
                     program_name = line
                     if program_name in programs:
                         raise ValueError(f'Program name {program_name} is not unique, all program names must be unique')
-                    programs[program_name] = bdd.false                   
+                    programs[program_name] = []
+                    program_modified[program_name] = []
 
                     line = f.readline()
                     while line and line.split():
+                        modified, expression = split_modified_variables(line.strip(), mapping_variable_names, variables)
                         try:
-                            transition = map_new_variable_names(line, mapping_variable_names)
+                            transition = map_new_variable_names(expression, mapping_variable_names)
                             new_transition = bdd.add_expr(transition)
                         except Exception as e:
                             if isinstance(e, ValueError):
@@ -73,8 +150,13 @@ def SymbolicModelFromSymbolic(file: str) -> tuple[cudd.BDD, list[str], cudd.BDD,
                                 raise RuntimeError(f'Invalid character/operator used in transition ({line})') from e
                             else:
                                 raise Exception(f'Unexpected error during the creation of the transition: {line}') from e
+
+                        if modified is not None:
+                            check_modified_variables(bdd, new_transition, modified, line.strip())
                             
-                        programs[program_name] = programs[program_name] | new_transition
+                        programs[program_name].append(new_transition)
+                        program_modified[program_name].append(modified)
+                        dependencies.append(bdd.support(new_transition))
                     
                         line = f.readline()
 
@@ -86,4 +168,7 @@ def SymbolicModelFromSymbolic(file: str) -> tuple[cudd.BDD, list[str], cudd.BDD,
             else:
                 line = f.readline()
     
-    return bdd, variables, law, programs, tests
+    # the transitions of a program are kept as clusters instead of being combined into one relation
+    programs = {name: PartitionedProgram.from_transitions(bdd, transitions, cluster_nodes, program_modified[name])
+                for name, transitions in programs.items()}
+    return bdd, variables, law, programs, tests, dependencies, init
@@ -1,13 +1,26 @@
 import numpy as np
 import dd.cudd as cudd
-from typing import Optional, Union
-from SymbolicInputToModel import SymbolicModelFromSymbolic
+from typing import Iterable, Optional, Union
+from Backend import get_backend
+from VariableRegistry import VariableRegistry
+from PartitionedProgram import CLUSTER_NODES, Modified, PartitionedProgram, frame_condition
+from Reordering import ReorderingControl
+from SymbolicInputToModel import SymbolicModelFromSymbolic, check_modified_variables
+from ModelSnapshot import load_snapshot, save_snapshot
+from Witness import Witness, WitnessExtractor
+from ConeOfInfluence import ConeOfInfluence
+from Bisimulation import BisimulationMinimizer, Quotient
+from time import perf_counter
 import random
 
 BDD = cudd.BDD
 
 class SymbolicModel:
-    def __init__(self, bdd, variables: list[str], law: cudd.BDD, programs: dict[str, cudd.BDD], tests: list[str]):
+    def __init__(self, bdd, variables: list[str], law: cudd.BDD, programs: dict[str, Union[cudd.BDD, PartitionedProgram]], tests: Optional[list[str]] = None,
+                 programs_restricted: bool = False, variable_order: Union[str, list[str], None] = 'interleaved',
+                 dependencies: Iterable[Iterable[str]] = (), reordering: Optional[str] = None,
+                 reordering_options: Optional[dict] = None, init: Optional[BDD] = None,
+                 cluster_nodes: Optional[int] = CLUSTER_NODES):
         """Creates a symbolically represented kripke model.
 
         Contains
@@ -18,33 +31,315 @@ class SymbolicModel:
         evaluation, based on the current model
 
         Args:
-            num_states (int): Number of states in the model
-            valuations (list[list[int]]): List of valuation list of propositions. Length of the 
-            outer list is the amount of propositions, length of inner list must match the number of
-            states. 
-            proposition_names (list[str]): Names of the propositions as matched to the valuations list.
-            programs (list[np.ndarray]): List of programs in explicit matrix notation. 
-            program_names (list[str]): List of program names as matched to the programs list.
+            bdd (cudd.BDD): BDD manager of the law and the programs
+            variables (list[str]): Names of the state variables (the propositions)
+            law (cudd.BDD): Boolean expression over the variables that holds in every state of the
+            model
+            programs (dict[str, Union[BDD, PartitionedProgram]]): The programs per name, a
+            program given as one relation is stored as a PartitionedProgram with one cluster.
+            tests (Optional[list[str]], optional): PDL formulas stored with the model, see
+            file_tests. Defaults to None.
+            programs_restricted (bool, optional): The programs are already restricted to the law 
+            (for instance when they are loaded from a snapshot). Defaults to False.
+            variable_order (Union[str, list[str], None], optional): Variable ordering policy, one
+            of VARIABLE_ORDERS, an order of the variables or None to keep the current order. 
+            Defaults to 'interleaved'.
+            dependencies (Iterable[Iterable[str]], optional): Groups of variables that occur 
+            together, for the 'dependency' order. Defaults to the supports of the law and the 
+            programs.
+            reordering (Optional[str], optional): Dynamic reordering profile, one of 
+            REORDERING_PROFILES, or None to keep the setting of the BDD manager. Defaults to None.
+            reordering_options (Optional[dict], optional): Keyword arguments for the 
+            ReorderingControl (threshold, max_growth, max_swaps, max_vars). Defaults to None.
+            init (Optional[BDD], optional): The initial states, from which the reachable states 
+            are computed by restrict_to_reachable. Defaults to None.
+            cluster_nodes (Optional[int], optional): Maximum number of nodes of a cluster that 
+            add_transition adds transitions to. Defaults to CLUSTER_NODES.
         """        
 
         self.bdd = bdd
         self.variables = variables
+        if variable_order == 'dependency' and not dependencies:
+            dependencies = [bdd.support(law)] + [support for program in programs.values()
+                                                 for support in PartitionedProgram.wrap(bdd, program).supports]
+        self.registry = VariableRegistry(bdd, variables, variable_order, dependencies)
+        self.backend = self.registry.backend
+        self.reordering = ReorderingControl(bdd, reordering, **(reordering_options or {}))
+        self.reordering.group(self.registry.variable_groups())
 
         self.law = law
+        self.init = init
         self.tests = tests
+        self.cluster_nodes = cluster_nodes
+        # the report of restrict_to_reachable, None while the model is not restricted
+        self.reachability = None
+        # check every formula on the cone of influence of the formula, see ConeOfInfluence
+        self.cone_of_influence = False
+        self.cones = ConeOfInfluence(self)
 
         self.programs = programs
 
         for program_name, program in self.programs.items():
-            self.programs[program_name] = cudd.restrict(program, self.law)
+            program = PartitionedProgram.wrap(bdd, program)
+            if not programs_restricted:
+                program = program.map(lambda cluster: self.backend.restrict(cluster, self.law))
+            self.programs[program_name] = program
+
+        self.primed_law = self._add_primes(self.law)
 
         from Parser import PDLTransformer 
         self.transformer = PDLTransformer(self)
 
+        self.reordering.start()
+
     @classmethod
-    def from_file(cls, file_name: str) -> "SymbolicModel":
-        bdd, variables, law, programs, tests = SymbolicModelFromSymbolic(file_name)
-        return cls(bdd, variables, law, programs, tests) 
+    def from_file(cls, file_name: str, snapshot_file: Optional[str] = None, closures: Iterable[str] = (),
+                  variable_order: Union[str, list[str]] = 'interleaved', reordering: Optional[str] = None,
+                  reordering_options: Optional[dict] = None, backend: str = 'cudd',
+                  workers: Optional[int] = None, reachable: bool = False,
+                  cluster_nodes: Optional[int] = CLUSTER_NODES) -> "SymbolicModel":
+        """Reads a symbolic model from a file. 
+        
+        If a snapshot file is given and it was made from the current contents of the file, the 
+        model is loaded from the snapshot instead, without parsing the file. Otherwise the file is
+        parsed and a new snapshot is written.
+
+        Args:
+            file_name (str): path to the symbolic input file
+            snapshot_file (Optional[str], optional): path of the snapshot of the model. Defaults 
+            to None, which means no snapshot is used.
+            closures (Iterable[str], optional): names of programs whose closure is stored in a new
+            snapshot. Defaults to ().
+            variable_order (Union[str, list[str]], optional): Variable ordering policy for a model
+            that is parsed, a snapshot keeps its stored order. Defaults to 'interleaved'.
+            reordering (Optional[str], optional): Dynamic reordering profile. Defaults to None.
+            reordering_options (Optional[dict], optional): Options of the reordering profile. 
+            Defaults to None.
+            backend (str, optional): BDD package, one of BACKENDS. Defaults to 'cudd'.
+            workers (Optional[int], optional): number of cores used by the sylvan backend. 
+            Defaults to None, all cores.
+            reachable (bool, optional): Restrict the model to the states reachable from the INIT
+            section, see restrict_to_reachable. A snapshot stores the unrestricted model. 
+            Defaults to False.
+            cluster_nodes (Optional[int], optional): Maximum number of nodes of a cluster of 
+            transitions of a parsed program, see PartitionedProgram.from_transitions. Defaults to
+            CLUSTER_NODES.
+
+        Raises:
+            ValueError: A snapshot is requested on a backend that cannot write snapshots
+
+        Returns:
+            SymbolicModel: the model
+        """        
+        bdd_backend = get_backend(backend)
+        if snapshot_file is not None and not bdd_backend.snapshots:
+            raise ValueError(f'Snapshots can only be used with the cudd backend, not with {backend}')
+
+        if snapshot_file is not None:
+            snapshot = load_snapshot(snapshot_file, file_name)
+            if snapshot is not None:
+                bdd, variables, law, programs, tests, stored_closures, init = snapshot
+                model = cls(bdd, variables, law, programs, tests, programs_restricted=True, variable_order=None,
+                            reordering=reordering, reordering_options=reordering_options, init=init,
+                            cluster_nodes=cluster_nodes)
+                for name, closure in stored_closures.items():
+                    model.transformer.closures[model.programs[name]] = closure
+                if reachable:
+                    model.restrict_to_reachable()
+                return model
+
+        bdd, variables, law, programs, tests, dependencies, init = SymbolicModelFromSymbolic(file_name,
+                                                                                             bdd_backend.manager(workers),
+                                                                                             cluster_nodes)
+        model = cls(bdd, variables, law, programs, tests, variable_order=variable_order, dependencies=dependencies,
+                    reordering=reordering, reordering_options=reordering_options, init=init,
+                    cluster_nodes=cluster_nodes)
+        if snapshot_file is not None:
+            model.save_snapshot(snapshot_file, file_name, closures)
+        if reachable:
+            model.restrict_to_reachable()
+        return model
+
+    def save_snapshot(self, snapshot_file: str, source_file: str, closures: Iterable[str] = ()) -> None:
+        """Writes the model to a snapshot, see ModelSnapshot.save_snapshot.
+
+        Args:
+            snapshot_file (str): path of the snapshot
+            source_file (str): the file the model was read from, its checksum is stored to detect
+            changes
+            closures (Iterable[str], optional): names of programs whose closure is stored as well.
+            Defaults to ().
+        """        
+        save_snapshot(self, snapshot_file, source_file, closures)
+
+    def restrict_to_reachable(self) -> dict:
+        """Restricts the law and the programs to the states reachable from the initial states.
+
+        The reachable states are found with chaining: the programs are applied one after the 
+        other, each until it finds no new states, and the states found by one program are used 
+        right away by the next. This repeats until a full round over the programs adds nothing.
+        The programs are then restricted to the new law and the transformer is recreated, so no
+        result computed over the old law is reused.
+
+        Raises:
+            ValueError: The model has no initial states
+
+        Returns:
+            dict: the time it took, the number of rounds, and the number of states and nodes of 
+            the law and the programs before and after, also stored in self.reachability
+        """        
+        if self.init is None:
+            raise ValueError('The model has no initial states, add an INIT section to the input file')
+
+        t0 = perf_counter()
+        report = {'states_before': self.bdd.count(self.law, nvars=len(self.variables)),
+                  'law_nodes_before': len(self.law),
+                  'program_nodes_before': sum(len(program) for program in self.programs.values())}
+
+        reachable = self.init & self.law
+        rounds = 0
+        changed = True
+        while changed:
+            changed = False
+            rounds += 1
+            for program in self.programs.values():
+                frontier = reachable
+                while frontier != self.bdd.false:
+                    frontier = self.transformer._postimage(program, frontier) & ~reachable
+                    if frontier != self.bdd.false:
+                        reachable |= frontier
+                        changed = True
+
+        self.law = reachable
+        for program_name, program in self.programs.items():
+            self.programs[program_name] = program.map(lambda cluster: self.backend.restrict(cluster, self.law))
+        self.primed_law = self._add_primes(self.law)
+
+        from Parser import PDLTransformer
+        self.transformer = PDLTransformer(self, self.transformer.star_strategy)
+        self.cones = ConeOfInfluence(self)
+
+        report.update({'states_after': self.bdd.count(self.law, nvars=len(self.variables)),
+                       'law_nodes_after': len(self.law),
+                       'program_nodes_after': sum(len(program) for program in self.programs.values()),
+                       'rounds': rounds, 'time': perf_counter() - t0})
+        self.reachability = report
+        return report
+
+    def add_transition(self, program_name: str, transition: Union[str, BDD], modified: Optional[Iterable[str]] = None) -> None:
+        """Adds a transition to a program. The transition is added to the last cluster of the
+        program while it stays below cluster_nodes nodes, the other clusters are not touched.
+
+        Only the cached results that use the program are forgotten, see PDLTransformer.invalidate.
+
+        Args:
+            program_name (str): name of the program
+            transition (Union[str, BDD]): the transition as an expression over the unprimed and
+            primed variables, as on a line of the PROGRAMS section
+            modified (Optional[Iterable[str]], optional): the variables the transition modifies,
+            the others keep their value. Defaults to None, the transition describes all primed
+            variables.
+
+        Raises:
+            ValueError: Unknown program, or the transition changes variables that are not in
+            modified
+        """
+        program = self._program(program_name)
+        transition, modified = self._transition(transition, modified)
+        transition = self.backend.restrict(transition, self.law)
+        self._replace_programs({program_name: program.with_transition(transition, modified, self.cluster_nodes)})
+
+    def remove_transition(self, program_name: str, transition: Union[str, BDD], modified: Optional[Iterable[str]] = None) -> None:
+        """Removes the transitions described by an expression from a program, in every cluster.
+
+        Args:
+            program_name (str): name of the program
+            transition (Union[str, BDD]): the transitions to remove, as in add_transition
+            modified (Optional[Iterable[str]], optional): the variables the transitions modify.
+            Defaults to None, the expression describes all primed variables.
+
+        Raises:
+            ValueError: Unknown program, or the transition changes variables that are not in
+            modified
+        """
+        program = self._program(program_name)
+        transition, modified = self._transition(transition, modified)
+        if modified is not None:
+            transition &= frame_condition(self.bdd, self.registry.unprimed_variables - modified)
+        self._replace_programs({program_name: program.without(transition, self.variables)})
+
+    def add_program(self, program_name: str, transitions: Iterable[Union[str, BDD]],
+                    modified: Optional[Iterable[Optional[Iterable[str]]]] = None) -> None:
+        """Adds a new program, grouped into clusters like a program of the input file.
+
+        Args:
+            program_name (str): name of the new program
+            transitions (Iterable[Union[str, BDD]]): the transitions, as in add_transition
+            modified (Optional[Iterable[Optional[Iterable[str]]]], optional): per transition the
+            variables it modifies, or None. Defaults to None, no framed transitions.
+
+        Raises:
+            ValueError: The program name is already used, or a transition changes variables that
+            are not in its modified variables
+        """
+        if program_name in self.programs:
+            raise ValueError(f'Program name {program_name} is not unique, all program names must be unique')
+        transitions = list(transitions)
+        modified = [None] * len(transitions) if modified is None else list(modified)
+        framed = [self._transition(transition, variables) for transition, variables in zip(transitions, modified)]
+        program = PartitionedProgram.from_transitions(self.bdd, [transition for transition, _ in framed], 
+                                                      self.cluster_nodes, [variables for _, variables in framed])
+        self._replace_programs({program_name: program.map(lambda cluster: self.backend.restrict(cluster, self.law))})
+
+    def update_law(self, law: Union[str, BDD]) -> None:
+        """Replaces the law by a stronger one, for instance to check the formulas on a part of the
+        states. The programs are restricted to the new law.
+
+        The results of propositional subformulas are kept, everything with a modality or a 
+        composition is computed again.
+
+        Args:
+            law (Union[str, BDD]): the new law, a boolean expression over the unprimed variables
+
+        Raises:
+            ValueError: The new law allows states the current law excludes. The programs are 
+            restricted to the current law, so their transitions from those states are not known.
+        """
+        if isinstance(law, str):
+            law = self.bdd.add_expr(law)
+        if law & ~self.law != self.bdd.false:
+            raise ValueError('The law can only be strengthened, the programs are only known on the states of the current law')
+        self.law = law
+        self.primed_law = self._add_primes(law)
+        for program_name, program in self.programs.items():
+            self.programs[program_name] = program.map(lambda cluster: self.backend.restrict(cluster, self.law))
+        self.transformer.invalidate(law=True)
+        self.cones.invalidate(law=True)
+
+    def _program(self, program_name: str) -> PartitionedProgram:
+        if program_name not in self.programs:
+            raise ValueError(f'Unknown program {program_name}, expected one of {list(self.programs)}')
+        return self.programs[program_name]
+
+    def _transition(self, transition: Union[str, BDD], modified: Optional[Iterable[str]]) -> tuple[BDD, Modified]:
+        """Returns a transition as a BDD with its checked set of modified variables."""
+        description = transition if isinstance(transition, str) else 'BDD'
+        if isinstance(transition, str):
+            transition = self.bdd.add_expr(transition)
+        if modified is None:
+            return transition, None
+        modified = frozenset(modified)
+        undeclared = modified - self.registry.unprimed_variables
+        if undeclared:
+            raise ValueError(f'Modified variables {sorted(undeclared)} are not variables of the model')
+        check_modified_variables(self.bdd, transition, modified, description)
+        return transition, modified
+
+    def _replace_programs(self, programs: dict[str, PartitionedProgram]) -> None:
+        """Stores edited programs and forgets the results computed with their old value."""
+        self.transformer.invalidate({name: self.programs.get(name) for name in programs})
+        self.cones.invalidate(programs)
+        self.programs.update(programs)
 
     def __enter__(self):
         return self
@@ -54,9 +349,11 @@ class SymbolicModel:
 
     def _release_bdd_references(self):
         self.law = None
+        self.primed_law = None
         self.programs.clear()
         self.bdd = None
         self.transformer = None    
+        self.cones = None
 
     def _add_primes(self, expression: BDD) -> BDD:
         """Add primes to all variables from an expression
@@ -67,10 +364,7 @@ class SymbolicModel:
         Returns:
             BDD: the same expression with primes added to the variables
         """        
-        primed_name_map = {var: var + "'" for var in self.bdd.support(expression)}
-        for v in primed_name_map.values():
-            self.bdd.declare(v)
-        return self.bdd.let(primed_name_map, expression)
+        return self.registry.rename(expression, self.registry.prime_map)
     
     def _add_temporary(self, expression: BDD, is_primed: bool) -> BDD:
         """Adds temporary suffix 'T' to all variables in the expression.
@@ -85,18 +379,9 @@ class SymbolicModel:
         Returns:
             BDD: same boolean expression as input with T suffix added
         """        
-        remapping = {}
-        for var in self.bdd.support(expression):
-            if var.endswith("'") and is_primed:
-                remapping[var] = var[:-1] + 'T'
-            elif not var.endswith("'") and not is_primed:
-                remapping[var] = var + 'T'
-
-        for temp_var in remapping.values():
-            self.bdd.declare(temp_var)
-
-        return self.bdd.let(remapping, expression)
-        
+        if is_primed:
+            return self.registry.rename(expression, self.registry.primed_to_temporary)
+        return self.registry.rename(expression, self.registry.unprimed_to_temporary)
 
     def check(self, PDL_expression: str, state_valuation: Optional[str]=None, print_bdd_filename: Optional[str]=None) -> Union[bool, tuple[list[int], str]]:
         """Evaluates a PDL expression within the Kripke model. If a state is provided gives the 
@@ -118,12 +403,12 @@ class SymbolicModel:
                   PDL expression in the model.
         """        
         
-        states_where_true = self.transformer.evaluate_expression(PDL_expression)
+        states_where_true = self._evaluate(PDL_expression)
 
         if state_valuation:
             state_valuation_bdd = self.bdd.add_expr(state_valuation)
-            if state_valuation_bdd.implies(self.law) == self.bdd.true:
-                return state_valuation_bdd.implies(states_where_true) == self.bdd.true
+            if self.bdd.apply('->', state_valuation_bdd, self.law) == self.bdd.true:
+                return self.bdd.apply('->', state_valuation_bdd, states_where_true) == self.bdd.true
             else:
                 raise ValueError('State not found in model')
         
@@ -131,6 +416,51 @@ class SymbolicModel:
             self.bdd.dump(print_bdd_filename, roots=[states_where_true])
         
         
+    def _evaluate(self, PDL_expression: str) -> BDD:
+        """Evaluates a formula, on its cone of influence when cone_of_influence is set. The
+        result over the cone variables has the same value as the full evaluation in every state
+        of the law."""
+        if self.cone_of_influence:
+            reduced = self.cones.reduce(self.transformer.compile(PDL_expression))
+            if reduced is not None:
+                return reduced.transformer.evaluate_expression(PDL_expression)
+        return self.transformer.evaluate_expression(PDL_expression)
+
+    def minimize(self, propositions: Optional[Iterable[str]] = None) -> Quotient:
+        """Divides the model by its coarsest bisimulation over the propositions and all programs,
+        see BisimulationMinimizer. Formulas over the propositions are checked on the quotient 
+        with Quotient.check, the results are lifted back to the states of this model.
+
+        Args:
+            propositions (Optional[Iterable[str]], optional): the propositions the formulas use.
+            Defaults to None, all variables, which leaves every state in a block of its own.
+
+        Raises:
+            ValueError: A proposition is not a variable of the model
+
+        Returns:
+            Quotient: the quotient model, the block map and the report of the minimization
+        """
+        return BisimulationMinimizer(self).minimize(propositions)
+
+    def witness(self, PDL_expression: str, state_valuation: Optional[str] = None) -> Optional[Witness]:
+        """Returns a shortest path that shows why <program>formula holds (a witness) or why 
+        [program]formula fails (a counterexample), see WitnessExtractor.
+
+        Args:
+            PDL_expression (str): A diamond or box formula.
+            state_valuation (Optional[str], optional): A Boolean expression describing the state 
+            the path starts in. Defaults to None, any state of the model.
+
+        Raises:
+            ValueError: The formula is not a diamond or a box
+
+        Returns:
+            Optional[Witness]: the path, or None if the diamond holds nowhere or the box everywhere
+            (in the given state)
+        """
+        return WitnessExtractor(self).extract(PDL_expression, state_valuation)
+
     def file_tests(self) -> None:
         return self.tests
     
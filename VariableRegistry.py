@@ -0,0 +1,176 @@
+import dd.cudd as cudd
+from Backend import backend_of
+from typing import Iterable, Union
+
+BDD = cudd.BDD
+
+# 'interleaved': x, x', xT next to each other for every variable, in the given order
+# 'blocked': all unprimed variables, then all primed, then all temporary variables
+# 'dependency': interleaved, with the variables that occur together kept close (see dependency_order)
+VARIABLE_ORDERS = ('interleaved', 'blocked', 'dependency')
+
+
+def dependency_order(variables: list[str], dependencies: Iterable[Iterable[str]]) -> list[str]:
+    """Orders variables so that variables which occur together end up close to each other.
+
+    Two variables are connected with a weight equal to the number of dependency groups (for
+    instance the supports of the transitions of a program) they share. Starting from the most
+    connected variable, the next variable is always the one with the strongest connection to the
+    variables placed so far. Ties are broken by the number of connections and then by the given
+    order, so without dependencies the given order is kept.
+
+    Args:
+        variables (list[str]): the variables in their declared order
+        dependencies (Iterable[Iterable[str]]): groups of variables that depend on each other,
+        names of variables that are not in `variables` are ignored
+
+    Returns:
+        list[str]: the variables in the new order
+    """
+    position = {var: index for index, var in enumerate(variables)}
+    weights = {var: {} for var in variables}
+    for group in dependencies:
+        group = sorted({var for var in group if var in position}, key=position.get)
+        for i, first in enumerate(group):
+            for second in group[i + 1:]:
+                weights[first][second] = weights[first].get(second, 0) + 1
+                weights[second][first] = weights[second].get(first, 0) + 1
+
+    degree = {var: sum(weights[var].values()) for var in variables}
+    attachment = dict.fromkeys(variables, 0)
+    order = []
+    while attachment:
+        var = max(attachment, key=lambda v: (attachment[v], degree[v], -position[v]))
+        del attachment[var]
+        order.append(var)
+        for neighbour, weight in weights[var].items():
+            if neighbour in attachment:
+                attachment[neighbour] += weight
+    return order
+
+
+class VariableRegistry:
+    def __init__(self, bdd: cudd.BDD, variables: list[str], order: Union[str, list[str], None] = 'interleaved',
+                 dependencies: Iterable[Iterable[str]] = ()):
+        """Keeps track of the state variables of a model and their primed and temporary copies.
+
+        All copies are declared once, when the registry is created, and the renaming maps and
+        quantification sets used during evaluation are built at the same time. This way the
+        evaluation never has to scan the support of an expression or declare new variables.
+
+        - unprimed variables ("x") describe the current state
+        - primed variables ("x'") describe the target state of a transition
+        - temporary variables ("xT") describe the intermediate state of a composition
+
+        The variable order of the BDD manager is set according to `order`. With an interleaved
+        order a relational product only has to look a few levels down to match a variable with
+        its copy, with a blocked order every copy sits below all other variables. On a backend
+        with a static order (sylvan) the variables are declared in that order instead, variables
+        that are already declared keep their level.
+
+        Args:
+            bdd (cudd.BDD): The BDD manager of the model
+            variables (list[str]): The names of the unprimed state variables
+            order (Union[str, list[str], None], optional): One of VARIABLE_ORDERS, an order of the
+            unprimed variables (their copies are interleaved), or None to keep the current order
+            of the manager (for instance when it is loaded from a snapshot). Defaults to
+            'interleaved'.
+            dependencies (Iterable[Iterable[str]], optional): groups of variables that occur
+            together, used by the 'dependency' order. Primed names are counted as their unprimed
+            variable. Defaults to ().
+
+        Raises:
+            ValueError: Unknown order, or an order that is not a permutation of the variables
+        """
+        self.bdd = bdd
+        self.variables = list(variables)
+        self.primed = [var + "'" for var in self.variables]
+        self.temporary = [var + 'T' for var in self.variables]
+
+        self.prime_map = dict(zip(self.variables, self.primed))
+        self.unprime_map = dict(zip(self.primed, self.variables))
+        self.primed_to_temporary = dict(zip(self.primed, self.temporary))
+        self.unprimed_to_temporary = dict(zip(self.variables, self.temporary))
+
+        self.unprimed_variables = frozenset(self.variables)
+        self.primed_variables = frozenset(self.primed)
+        self.temporary_variables = frozenset(self.temporary)
+
+        self.backend = backend_of(bdd)
+        level_order = self.level_order(order, dependencies) if order is not None else None
+        if self.backend.static_order and level_order is not None:
+            self.bdd.declare(*level_order)
+        else:
+            self.bdd.declare(*self.variables)
+            self.bdd.declare(*self.primed)
+            self.bdd.declare(*self.temporary)
+            if level_order is not None:
+                self.apply_order(level_order)
+
+    def level_order(self, order: Union[str, list[str]], dependencies: Iterable[Iterable[str]] = ()) -> list[str]:
+        """Returns all variables of the registry (including the copies) from the top level down.
+
+        Args:
+            order (Union[str, list[str]]): One of VARIABLE_ORDERS, or an order of the unprimed
+            variables
+            dependencies (Iterable[Iterable[str]], optional): groups of variables that occur
+            together, used by the 'dependency' order. Defaults to ().
+
+        Raises:
+            ValueError: Unknown order, or an order that is not a permutation of the variables
+
+        Returns:
+            list[str]: the variables in order
+        """
+        if order == 'blocked':
+            return self.variables + self.primed + self.temporary
+        if order == 'interleaved':
+            unprimed_order = self.variables
+        elif order == 'dependency':
+            dependencies = ([self.unprime_map.get(var, var) for var in group] for group in dependencies)
+            unprimed_order = dependency_order(self.variables, dependencies)
+        elif isinstance(order, str):
+            raise ValueError(f'Unknown variable order {order}, expected one of {VARIABLE_ORDERS} or a list of variables')
+        else:
+            unprimed_order = list(order)
+            if sorted(unprimed_order) != sorted(self.variables):
+                raise ValueError(f'The variable order {unprimed_order} is not an order of the variables {self.variables}')
+
+        return [copy for var in unprimed_order
+                for copy in (var, self.prime_map[var], self.unprimed_to_temporary[var])]
+
+    def apply_order(self, level_order: list[str]) -> None:
+        """Moves the variables to the given levels. Variables of the manager that are not in the
+        order keep their relative order below them.
+
+        Args:
+            level_order (list[str]): variables from the top level down
+        """
+        placed = set(level_order)
+        rest = sorted((var for var in self.bdd.vars if var not in placed), key=self.bdd.level_of_var)
+        levels = {var: level for level, var in enumerate(level_order + rest)}
+        if levels != self.bdd.var_levels:
+            self.backend.reorder(self.bdd, levels)
+
+    def variable_groups(self) -> list[list[str]]:
+        """Returns every variable with its primed and temporary copy, the groups that should move
+        together when the manager is reordered.
+
+        Returns:
+            list[list[str]]: a group per unprimed variable
+        """
+        return [[var, self.prime_map[var], self.unprimed_to_temporary[var]] for var in self.variables]
+
+    def rename(self, expression: BDD, mapping: dict[str, str]) -> BDD:
+        """Renames the variables in an expression with one of the prebuilt maps.
+
+        Args:
+            expression (BDD): boolean expression
+            mapping (dict[str, str]): one of the renaming maps of this registry
+
+        Returns:
+            BDD: the same expression with the variables renamed
+        """
+        if not mapping:
+            return expression
+        return self.bdd.let(mapping, expression)
@@ -0,0 +1,174 @@
+import dd.cudd as cudd
+from Parser import Closure
+from QueryPlan import PlanNode, plan_text
+
+from typing import Optional
+
+BDD = cudd.BDD
+# a state as the value of every proposition
+Valuation = dict[str, bool]
+
+
+class Witness:
+    def __init__(self, formula: str, kind: str, start: Valuation, steps: list[tuple[str, Valuation]]):
+        """A path through the model that shows why a modal formula holds in a state (a witness of
+        <program>formula) or why it does not (a counterexample of [program]formula).
+
+        Args:
+            formula (str): the checked formula
+            kind (str): 'witness' or 'counterexample'
+            start (Valuation): the state the path starts in
+            steps (list[tuple[str, Valuation]]): every step as the atomic program (or test) that
+            is taken and the state it leads to, a test stays in the same state
+        """
+        self.formula = formula
+        self.kind = kind
+        self.start = start
+        self.steps = steps
+
+    @property
+    def states(self) -> list[Valuation]:
+        return [self.start] + [state for _, state in self.steps]
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __str__(self) -> str:
+        def valuation(state: Valuation) -> str:
+            return ' & '.join(var if value else '!' + var for var, value in sorted(state.items()))
+
+        lines = [f'{self.kind.capitalize()} for {self.formula} ({len(self)} steps):', f'  {valuation(self.start)}']
+        lines += [f'  --{step}--> {valuation(state)}' for step, state in self.steps]
+        return '\n'.join(lines)
+
+
+class WitnessExtractor:
+    def __init__(self, model):
+        """Extracts witnesses and counterexamples from a symbolic or explicit model.
+
+        Only BDDs of sets of states are computed: the path is built step by step from its start
+        state, every step picks one successor (with pick) within the states from which the rest
+        of the program can still reach the target. An iterated program is unrolled with the
+        onion rings of its fixpoint (PDLTransformer._reachability_fixpoint), so it takes as few
+        iterations as possible, and the rings are only computed up to the ring of the current
+        state. The cost grows with the length of the path, not with the number of states.
+
+        Args:
+            model (Union[SymbolicModel, ExplicitSymbolicModel]): the model
+        """
+        self.model = model
+        self.transformer = model.transformer
+        self.care_vars = set(model.registry.variables)
+
+    def extract(self, formula: str, state_valuation: Optional[str] = None) -> Optional[Witness]:
+        """Returns a witness of a diamond formula or a counterexample of a box formula.
+
+        Args:
+            formula (str): a PDL formula of the form <program>formula or [program]formula
+            state_valuation (Optional[str], optional): Boolean expression of the state the path
+            starts in, a state of the model that satisfies it is picked. Defaults to None, any
+            state where the diamond holds (or the box fails).
+
+        Raises:
+            ValueError: The formula is not a diamond or a box, or the given state is not in the
+            model
+
+        Returns:
+            Optional[Witness]: the path, or None when the diamond holds in no (given) state or the
+            box holds in every (given) state
+        """
+        # the path follows the program as it is written, its parts are evaluated rewritten
+        plan = self.transformer.compile(formula, rewrite=False)
+        if plan.op not in ('diamond', 'box'):
+            raise ValueError(f'Witnesses exist for <program>formula and counterexamples for [program]formula, not for {formula}')
+        program, target = plan.items
+        holds = self._evaluate(plan)
+        target_states = self._evaluate(target)
+        if plan.op == 'box':
+            holds, target_states = ~holds, ~target_states
+        target_states &= self.model.law
+
+        start = self.model.law & holds
+        if state_valuation:
+            state = self.model.bdd.add_expr(state_valuation)
+            if state & self.model.law == self.model.bdd.false:
+                raise ValueError('State not found in model')
+            start &= state
+        start_state = self._pick(start)
+        if start_state is None:
+            return None
+
+        steps = []
+        self._extend(program, self._cube(start_state), target_states, steps)
+        kind = 'witness' if plan.op == 'diamond' else 'counterexample'
+        return Witness(formula, kind, start_state, steps)
+
+    def _extend(self, program: PlanNode, state: BDD, target: BDD, steps: list[tuple[str, Valuation]]) -> BDD:
+        """Appends the steps of a path from a state with the program into the target states.
+
+        Args:
+            program (PlanNode): the program
+            state (BDD): cube of the current state, from which the program can reach the target
+            target (BDD): the states the path should end in, within the law
+            steps (list[tuple[str, Valuation]]): the path so far
+
+        Returns:
+            BDD: cube of the last state of the path
+        """
+        if program.op == 'program_symbol':
+            successors = self.transformer._postimage(self.model.programs[program.items[0]], state) & target
+            successor = self._pick(successors)
+            steps.append((program.items[0], successor))
+            return self._cube(successor)
+
+        if program.op == 'test':
+            steps.append((plan_text(program), self._pick(state)))
+            return state
+
+        if program.op == 'choice':
+            first, _, second = program.items
+            if state & self._preimage(first, target) != self.model.bdd.false:
+                return self._extend(first, state, target, steps)
+            return self._extend(second, state, target, steps)
+
+        if program.op == 'seq':
+            first, _, second = program.items
+            state = self._extend(first, state, self._preimage(second, target) & self.model.law, steps)
+            return self._extend(second, state, target, steps)
+
+        if program.op == 'star':
+            iterated = program.items[0]
+            value = self._evaluate(iterated)
+            if isinstance(value, Closure):
+                # (a*)* is a*
+                return self._extend(iterated, state, target, steps)
+            rings = []
+            self.transformer._reachability_fixpoint(value, target, 'witness', rings, until=state)
+            # the state is in the last ring, every iteration moves it one ring inwards
+            for ring in reversed(rings[:-1]):
+                state = self._extend(iterated, state, ring & self.model.law, steps)
+            return state
+
+        raise ValueError(f'Unknown program operator {program.op}')
+
+    def _preimage(self, program: PlanNode, target: BDD) -> BDD:
+        """Returns the states from which the program can reach the target, <program>target. Like
+        in a rewritten plan, tests, sequences and choices are evaluated over sets of states."""
+        if program.op == 'test':
+            return self._evaluate(program.items[0]) & target
+        if program.op == 'seq':
+            first, _, second = program.items
+            return self._preimage(first, self._preimage(second, target))
+        if program.op == 'choice':
+            first, _, second = program.items
+            return self._preimage(first, target) | self._preimage(second, target)
+        return self.transformer.diamond([self._evaluate(program), target])
+
+    def _evaluate(self, node: PlanNode):
+        return self.transformer.evaluate_plan(self.transformer.compiler.rewrite(node))
+
+    def _pick(self, states: BDD) -> Optional[Valuation]:
+        return self.model.bdd.pick(states, care_vars=self.care_vars)
+
+    def _cube(self, state: Valuation) -> BDD:
+        return self.model.bdd.cube(state)
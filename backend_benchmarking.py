@@ -0,0 +1,67 @@
+import multiprocessing
+import time
+import pandas as pd
+from typing import Optional
+from benchmarking import create_symbolic_model
+from SymbolicModel import SymbolicModel
+from Backend import BACKENDS, get_backend
+
+CHAIN_FORMULAS = ['<a*>p', '[a*]p', '<a;a>p', '<a*;a>p']
+THREADS = [1, 2, 4, 8]
+# the pure Python backend is only run on the smaller models
+MAX_STATES = {'autoref': 1000}
+
+
+def run(backend: str, num_states: int, workers: Optional[int]) -> dict:
+    """Builds a chain model on a backend and checks the chain formulas, in a fresh process so
+    every run gets its own (sylvan) manager and core set.
+
+    Args:
+        backend (str): one of BACKENDS
+        num_states (int): number of states of the chain
+        workers (Optional[int]): number of cores for sylvan, None for the other backends
+
+    Returns:
+        dict: wall clock and CPU time of the construction and of the checks
+    """
+    t0, c0 = time.perf_counter(), time.process_time()
+    bdd, prop_names, law, programs = create_symbolic_model(num_states, bdd=get_backend(backend).manager(workers))
+    model = SymbolicModel(bdd, prop_names, law, programs)
+    t1, c1 = time.perf_counter(), time.process_time()
+    for formula in CHAIN_FORMULAS:
+        model.transformer.evaluate_expression(formula)
+    t2, c2 = time.perf_counter(), time.process_time()
+    return {'construction_time': t1 - t0, 'check_time': t2 - t1,
+            'construction_cpu': c1 - c0, 'check_cpu': c2 - c1}
+
+
+def available(backend: str) -> bool:
+    try:
+        get_backend(backend)
+    except ImportError:
+        print(f'Skipping {backend}, dd is not built with it')
+        return False
+    return True
+
+
+def main():
+    results = []
+    context = multiprocessing.get_context('spawn')
+
+    for backend in filter(available, BACKENDS):
+        for workers in THREADS if backend == 'sylvan' else [None]:
+            for num_states in [100, 1000, 10_000, 100_000]:
+                if num_states > MAX_STATES.get(backend, num_states):
+                    continue
+                with context.Pool(1) as pool:
+                    timings = pool.apply(run, (backend, num_states, workers))
+                result = {'backend': backend, 'workers': workers, 'num_states': num_states, **timings}
+                print(result)
+                results.append(result)
+
+    df = pd.DataFrame(results)
+    df.to_csv('backend_results.csv', index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ import numpy as np
 from math import ceil, log2
 import pandas as pd
 from datetime import datetime
+from typing import Optional
 
 def encode_state(bdd, var_names, index) -> cudd.BDD:
     bits = bin(index)[2:].zfill(len(var_names))
@@ -15,8 +16,9 @@ def encode_state(bdd, var_names, index) -> cudd.BDD:
         cube &= bdd.var(var) if bit == '1' else ~bdd.var(var)
     return cube
 
-def create_symbolic_model(num_states: int, reorder: bool = False) -> tuple[cudd.BDD, list[str], cudd.BDD, dict[str, cudd.BDD]]:
-    bdd = cudd.BDD()
+def create_symbolic_model(num_states: int, reorder: bool = False, bdd: Optional[cudd.BDD] = None) -> tuple[cudd.BDD, list[str], cudd.BDD, dict[str, cudd.BDD]]:
+    if bdd is None:
+        bdd = cudd.BDD()
     bdd.configure(reordering=reorder)
 
     if num_states < 3:
@@ -52,7 +54,8 @@ def create_symbolic_model(num_states: int, reorder: bool = False) -> tuple[cudd.
     program |= encode_state(bdd, state_vars, num_states - 3) & encode_state(bdd, state_vars_primed, num_states - 1) & bdd.var("p'")
 
     programs = {'a': program}
-    return bdd, state_vars, law, programs
+    # p is a proposition of the model as well, so it gets a primed copy
+    return bdd, state_vars + ['p'], law, programs
 
 
 def create_explicit_model(num_states: int) -> tuple[int, list[list[int]], list[str], list[np.ndarray], list[str]]:
@@ -72,6 +75,8 @@ def create_explicit_model(num_states: int) -> tuple[int, list[list[int]], list[s
         valuations.append(bits)
 
     valuations = np.array(valuations).T.tolist()
+    # p holds in the final state
+    valuations.append([int(i == num_states - 1) for i in range(num_states)])
 
     program = np.zeros((num_states, num_states))
     program[0][1] = 1
@@ -84,46 +89,51 @@ def create_explicit_model(num_states: int) -> tuple[int, list[list[int]], list[s
     return num_states, valuations, proposition_names, programs, program_names
 
 
-results = []
+def main():
+    results = []
 
-values = np.logspace(np.log10(10), np.log10(500), 30).astype(int).tolist()
+    values = np.logspace(np.log10(10), np.log10(500), 30).astype(int).tolist()
 
 
-for i in values[:20]:
-    bdd, prop_names, law, programs = create_symbolic_model(i)
-    model = SymbolicModel(bdd, prop_names, law, programs)
-    model.check('<a*>p')
-
-for i in values:
-    for j in range(3):
-        
-        start_cpu = time.process_time_ns()
-        bdd, prop_names, law, programs = create_symbolic_model(i, False)
+    for i in values[:20]:
+        bdd, prop_names, law, programs = create_symbolic_model(i)
         model = SymbolicModel(bdd, prop_names, law, programs)
         model.check('<a*>p')
-        time_taken = time.process_time_ns() - start_cpu 
-        print(f'num_states: {i}\nrun: {j},\nmethod: without_reordering, \nrun_time: {time_taken / 1e9}')
 
-        results.append({'num_states': i, 'run': j, 'method': 'without_reordering', 'run_time': time_taken/1e9})
+    for i in values:
+        for j in range(3):
+        
+            start_cpu = time.process_time_ns()
+            bdd, prop_names, law, programs = create_symbolic_model(i, False)
+            model = SymbolicModel(bdd, prop_names, law, programs)
+            model.check('<a*>p')
+            time_taken = time.process_time_ns() - start_cpu 
+            print(f'num_states: {i}\nrun: {j},\nmethod: without_reordering, \nrun_time: {time_taken / 1e9}')
+
+            results.append({'num_states': i, 'run': j, 'method': 'without_reordering', 'run_time': time_taken/1e9})
 
 
 
         
-        start_cpu = time.process_time_ns()
-        bdd, prop_names, law, programs = create_symbolic_model(i, True)
-        model = SymbolicModel(bdd, prop_names, law, programs)
-        model.check('<a*>p')
-        time_taken = time.process_time_ns() - start_cpu 
-        print(f'num_states: {i}\nrun: {j},\nmethod: with_reordering, \nrun_time: {time_taken / 1e9}')
+            start_cpu = time.process_time_ns()
+            bdd, prop_names, law, programs = create_symbolic_model(i, True)
+            model = SymbolicModel(bdd, prop_names, law, programs)
+            model.check('<a*>p')
+            time_taken = time.process_time_ns() - start_cpu 
+            print(f'num_states: {i}\nrun: {j},\nmethod: with_reordering, \nrun_time: {time_taken / 1e9}')
+
+            results.append({'num_states': i, 'run': j, 'method': 'with_reordering', 'run_time': time_taken/1e9})
+
+    current_time_str = datetime.now()
+    current_time_str = current_time_str.strftime("%H%M")
+    df = pd.DataFrame(results)
 
-        results.append({'num_states': i, 'run': j, 'method': 'with_reordering', 'run_time': time_taken/1e9})
+    # Save to disk
+    df.to_csv(f'results_{current_time_str}.csv', index=False)
 
-current_time_str = datetime.now()
-current_time_str = current_time_str.strftime("%H%M")
-df = pd.DataFrame(results)
 
-# Save to disk
-df.to_csv(f'results_{current_time_str}.csv', index=False)
+if __name__ == '__main__':
+    main()
 
 # # num_states = []
 # # time_taken = []
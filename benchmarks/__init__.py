@@ -0,0 +1,11 @@
+"""Scaling benchmarks of the model checker: parametrized model families, a formula corpus that
+uses every PDL operator, and a history of runs that can be compared against a baseline.
+
+Run from the repository root:
+    python -m benchmarks run --sizes small --save-baseline
+    python -m benchmarks run --label after-change
+    python -m benchmarks compare
+"""
+from benchmarks.formulas import FORMULAS, instantiate
+from benchmarks.generators import GENERATORS, SIZES, BenchmarkModel, generate
+from benchmarks.suite import compare, run
@@ -0,0 +1,41 @@
+# formula templates over the programs a and b and the propositions {p} and {q}, which every
+# benchmark family defines (see BenchmarkModel). Together they use every operator of the grammar:
+# the boolean connectives, both modalities, tests, sequences, choices and iterations.
+FORMULAS = [
+    '!{p}',
+    '{p} & {q}',
+    '{p} | !{q}',
+    '{p} -> {q}',
+    '{p} <-> {q}',
+    '<a>{p}',
+    '[a]{q}',
+    '<a>[b]{q}',
+    '<a;b>{p}',
+    '[a;b]{q}',
+    '<a U b>{p}',
+    '[a U b]{q}',
+    '<{q}?;a>{p}',
+    '[({p} | {q})?;b]{q}',
+    '<a*>{p}',
+    '[a*]{q}',
+    '<b*>{q}',
+    '[a*]<b*>{p}',
+    '<a*;b>({p} & !{q})',
+    '<(a;b)*>{p}',
+    '<(a U {q}?)*>{p}',
+    '[(a U b)*]({p} | {q})',
+]
+
+
+def instantiate(template: str, propositions: dict[str, str]) -> str:
+    """Fills in the propositions of a family, compound ones in parentheses.
+
+    Args:
+        template (str): one of FORMULAS
+        propositions (dict[str, str]): the formulas p and q stand for
+
+    Returns:
+        str: the PDL formula
+    """
+    return template.format(**{name: formula if formula.isidentifier() else f'({formula})'
+                              for name, formula in propositions.items()})
@@ -0,0 +1,205 @@
+import os
+import numpy as np
+from math import ceil, log2
+from typing import Callable
+
+from benchmarking import create_explicit_model, create_symbolic_model
+from ExplicitSymbolicModel import ExplicitSymbolicModel
+from SymbolicModel import SymbolicModel
+
+
+class BenchmarkModel:
+    def __init__(self, family: str, size: int, kind: str, data, propositions: dict[str, str]):
+        """A generated model of a benchmark family, which is built by the suite.
+
+        Every family has the programs a and b, and defines the propositions p and q of the
+        formula corpus as propositional formulas over its own variables.
+
+        Args:
+            family (str): name of the family, one of GENERATORS
+            size (int): the parameter of the family
+            kind (str): 'symbolic' for the text of a symbolic input file, 'explicit' for the
+            arguments of ExplicitSymbolicModel, or 'manager' for the arguments of SymbolicModel
+            data: the input of the model, depending on the kind
+            propositions (dict[str, str]): the formulas p and q stand for
+        """
+        self.family = family
+        self.size = size
+        self.kind = kind
+        self.data = data
+        self.propositions = propositions
+
+    def build(self, directory: str):
+        """Builds the model. A symbolic input file is written to the directory first, so only
+        reading and building it is part of the construction.
+
+        Args:
+            directory (str): directory for input files
+
+        Returns:
+            Union[SymbolicModel, ExplicitSymbolicModel]: the model
+        """
+        if self.kind == 'symbolic':
+            return SymbolicModel.from_file(self.input_file(directory))
+        if self.kind == 'explicit':
+            return ExplicitSymbolicModel(*self.data)
+        return SymbolicModel(*self.data)
+
+    def input_file(self, directory: str) -> str:
+        path = os.path.join(directory, f'{self.family}_{self.size}.txt')
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                f.write(self.data)
+        return path
+
+
+def symbolic_input(variables: list[str], law: str, programs: dict[str, list[str]]) -> str:
+    """Returns the text of a symbolic input file.
+
+    Args:
+        variables (list[str]): the propositions
+        law (str): the law
+        programs (dict[str, list[str]]): the transition lines per program
+
+    Returns:
+        str: the input file
+    """
+    lines = ['PROPS', ','.join(variables), '', 'LAW', law, '', 'PROGRAMS']
+    for name, transitions in programs.items():
+        lines += [name] + transitions + ['']
+    return '\n'.join(lines + ['TESTS', ''])
+
+
+def index_valuations(num_states: int) -> tuple[list[list[int]], list[str]]:
+    """Returns the binary encoding of the state indices as valuations, which makes every state
+    unique."""
+    bits = max(ceil(log2(num_states)), 1)
+    return [[(i >> bit) & 1 for i in range(num_states)] for bit in range(bits)], [f'x{bit}' for bit in range(bits)]
+
+
+def chain(size: int) -> BenchmarkModel:
+    """The chain of create_symbolic_model (a fork into two chains with steps of two, p in the
+    final state), with b the reversed chain."""
+    bdd, variables, law, programs = create_symbolic_model(size)
+    swap = {}
+    for var in variables:
+        swap[var], swap[var + "'"] = var + "'", var
+    programs['b'] = bdd.let(swap, programs['a'])
+    return BenchmarkModel('chain', size, 'manager', (bdd, variables, law, programs), {'p': 'p', 'q': variables[-2]})
+
+
+def chain_explicit(size: int) -> BenchmarkModel:
+    """The chain of create_explicit_model, with b the reversed chain."""
+    num_states, valuations, names, programs, program_names = create_explicit_model(size)
+    programs.append(programs[0].T.copy())
+    return BenchmarkModel('chain_explicit', size, 'explicit',
+                          (num_states, valuations, names, programs, program_names + ['b']),
+                          {'p': 'p', 'q': names[0]})
+
+
+def grid(size: int) -> BenchmarkModel:
+    """A size x size grid, a moves right or down and b left or up. p holds in the bottom right
+    corner and q on the diagonal."""
+    num_states = size * size
+    rows, columns = np.divmod(np.arange(num_states), size)
+    valuations, names = index_valuations(num_states)
+    valuations += [(np.arange(num_states) == num_states - 1).astype(int).tolist(), (rows == columns).astype(int).tolist()]
+
+    right, down = np.flatnonzero(columns < size - 1), np.flatnonzero(rows < size - 1)
+    a = (np.concatenate([right, down]), np.concatenate([right + 1, down + size]))
+    b = (a[1], a[0])
+    return BenchmarkModel('grid', size, 'explicit', (num_states, valuations, names + ['p', 'q'], [a, b], ['a', 'b']),
+                          {'p': 'p', 'q': 'q'})
+
+
+def random_sparse(size: int, degree: int = 3, seed: int = 0) -> BenchmarkModel:
+    """Random programs with `degree` successors per state on average. p holds in a tenth of the
+    states and q in half of them."""
+    rng = np.random.default_rng(seed)
+    valuations, names = index_valuations(size)
+    valuations += [(rng.random(size) < 0.1).astype(int).tolist(), (rng.random(size) < 0.5).astype(int).tolist()]
+    programs = []
+    for _ in range(2):
+        sources = rng.integers(0, size, size * degree)
+        programs.append((sources, rng.integers(0, size, size * degree)))
+    return BenchmarkModel('random', size, 'explicit', (size, valuations, names + ['p', 'q'], programs, ['a', 'b']),
+                          {'p': 'p', 'q': 'q'})
+
+
+def ring(size: int) -> BenchmarkModel:
+    """A token ring of `size` processes. a passes the token to the next process, b lets the
+    process with the token enter or leave its critical section."""
+    tokens, critical = [f't{i}' for i in range(size)], [f'c{i}' for i in range(size)]
+    one_hot = ['(' + ' | '.join(tokens) + ')'] + [f'!({tokens[i]} & {tokens[j]})' for i in range(size) for j in range(i + 1, size)]
+    law = ' & '.join(one_hot + [f'({c} -> {t})' for t, c in zip(tokens, critical)])
+    passes, toggles = [], []
+    for i in range(size):
+        t, c, next_t = tokens[i], critical[i], tokens[(i + 1) % size]
+        passes.append(f"{{{t}, {next_t}}} {t} & !{c} & !{t}' & {next_t}'")
+        toggles.append(f"{{{c}}} {t} & ({c}' <-> !{c})")
+    text = symbolic_input(tokens + critical, law, {'a': passes, 'b': toggles})
+    return BenchmarkModel('ring', size, 'symbolic', text, {'p': critical[-1], 'q': tokens[0]})
+
+
+def counter(size: int) -> BenchmarkModel:
+    """A binary counter of `size` bits, a increments it (wrapping around) and b resets it. p
+    holds when all bits are set and q when the lowest bit is set."""
+    bits = [f'x{i}' for i in range(size)]
+    increments = []
+    for i in range(size):
+        lower = bits[:i]
+        condition = [*lower, f'!{bits[i]}'] + [f"!{bit}'" for bit in lower] + [f"{bits[i]}'"]
+        increments.append('{' + ', '.join(lower + [bits[i]]) + '} ' + ' & '.join(condition))
+    increments.append('{' + ', '.join(bits) + '} ' + ' & '.join(bits + [f"!{bit}'" for bit in bits]))
+    reset = ['{' + ', '.join(bits) + '} ' + ' & '.join(f"!{bit}'" for bit in bits)]
+    text = symbolic_input(bits, 'TRUE', {'a': increments, 'b': reset})
+    return BenchmarkModel('counter', size, 'symbolic', text, {'p': ' & '.join(bits), 'q': bits[0]})
+
+
+def philosophers(size: int) -> BenchmarkModel:
+    """`size` dining philosophers with a fork between every two of them. a lets a philosopher
+    take both forks and eat, b lets an eating philosopher put them back. p holds when the first
+    philosopher eats and q when the second fork is taken."""
+    eating, forks = [f'e{i}' for i in range(size)], [f'f{i}' for i in range(size)]
+    law = []
+    for i in range(size):
+        left, right = forks[i], forks[(i + 1) % size]
+        law.append(f'({eating[i]} -> {left} & {right})')
+        law.append(f'({left} -> {eating[i]} | {eating[i - 1]})')
+    take, release = [], []
+    for i in range(size):
+        e, left, right = eating[i], forks[i], forks[(i + 1) % size]
+        take.append(f"{{{e}, {left}, {right}}} !{e} & !{left} & !{right} & {e}' & {left}' & {right}'")
+        release.append(f"{{{e}, {left}, {right}}} {e} & !{e}' & !{left}' & !{right}'")
+    text = symbolic_input(eating + forks, ' & '.join(law), {'a': take, 'b': release})
+    return BenchmarkModel('philosophers', size, 'symbolic', text, {'p': eating[0], 'q': forks[1 % size]})
+
+
+GENERATORS: dict[str, Callable[[int], BenchmarkModel]] = {
+    'chain': chain,
+    'chain_explicit': chain_explicit,
+    'grid': grid,
+    'ring': ring,
+    'counter': counter,
+    'philosophers': philosophers,
+    'random': random_sparse,
+}
+
+# the sizes every family is run with, per size class
+SIZES: dict[str, dict[str, list[int]]] = {
+    'small': {'chain': [101, 1001], 'chain_explicit': [101, 501], 'grid': [10, 30], 'ring': [4, 8],
+              'counter': [8, 16], 'philosophers': [4, 8], 'random': [100, 300]},
+    'medium': {'chain': [10001, 100001], 'chain_explicit': [1001, 2001], 'grid': [100, 300], 'ring': [16, 32],
+               'counter': [32, 64], 'philosophers': [16, 32], 'random': [1000, 2000]},
+}
+
+
+def generate(family: str, size: int) -> BenchmarkModel:
+    """Returns the model of a family with the given size.
+
+    Raises:
+        ValueError: Unknown family
+    """
+    if family not in GENERATORS:
+        raise ValueError(f'Unknown benchmark family {family}, expected one of {list(GENERATORS)}')
+    return GENERATORS[family](size)
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+from datetime import datetime
+from typing import Iterable, Optional
+
+from benchmarks.formulas import FORMULAS, instantiate
+from benchmarks.generators import GENERATORS, SIZES, generate
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BENCHMARK_DIRECTORY, 'history.jsonl')
+BASELINE_FILE = os.path.join(BENCHMARK_DIRECTORY, 'baseline.json')
+# the timings that identify a measurement, the time is the median over the repeats
+KEY = ['family', 'size', 'formula', 'phase']
+
+
+def run_family(family: str, size: int, repeats: int, formulas: Iterable[str], directory: str) -> list[dict]:
+    """Builds a model of the family `repeats` times and checks every formula on it.
+
+    The construction (generating the input is not included), the parsing of every formula and
+    its evaluation are timed separately, in CPU time. The subformula cache and the closures are
+    cleared before every formula, so a formula does not reuse the work of the formulas before it.
+
+    Args:
+        family (str): one of GENERATORS
+        size (int): parameter of the family
+        repeats (int): number of runs
+        formulas (Iterable[str]): formula templates, see FORMULAS
+        directory (str): directory for generated input files
+
+    Returns:
+        list[dict]: a record per repeat and phase (construction, parse, evaluation)
+    """
+    benchmark = generate(family, size)
+    formulas = list(formulas)
+    records = []
+    for repeat in range(repeats):
+        start_cpu = time.process_time()
+        model = benchmark.build(directory)
+        records.append({'family': family, 'size': size, 'formula': '', 'phase': 'construction', 'repeat': repeat,
+                        'time': time.process_time() - start_cpu})
+
+        transformer = model.transformer
+        for template in formulas:
+            formula = instantiate(template, benchmark.propositions)
+            transformer.cache.clear()
+            transformer.closures.clear()
+
+            start_cpu = time.process_time()
+            plan = transformer.compile(formula)
+            parse_time = time.process_time() - start_cpu
+
+            start_cpu = time.process_time()
+            result = transformer.evaluate_plan(plan)
+            evaluation_time = time.process_time() - start_cpu
+
+            for phase, run_time in (('parse', parse_time), ('evaluation', evaluation_time)):
+                records.append({'family': family, 'size': size, 'formula': template, 'phase': phase, 'repeat': repeat,
+                                'time': run_time, 'result_nodes': len(result)})
+        del transformer, model
+    return records
+
+
+def run(families: Iterable[str], size_class: str = 'small', repeats: int = 3,
+        formulas: Iterable[str] = FORMULAS, verbose: bool = True) -> list[dict]:
+    """Runs the suite on every size of the given families.
+
+    Args:
+        families (Iterable[str]): names of GENERATORS
+        size_class (str, optional): key of SIZES. Defaults to 'small'.
+        repeats (int, optional): number of runs per model. Defaults to 3.
+        formulas (Iterable[str], optional): formula templates. Defaults to FORMULAS.
+        verbose (bool, optional): print a line per model. Defaults to True.
+
+    Returns:
+        list[dict]: the records of all runs
+    """
+    formulas = list(formulas)
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        for family in families:
+            for size in SIZES[size_class][family]:
+                family_records = run_family(family, size, repeats, formulas, directory)
+                records += family_records
+                if verbose:
+                    frame = pd.DataFrame(family_records).groupby('phase')['time'].sum() / repeats
+                    print(f"{family} {size}: construction {frame['construction']:.3e}, parse {frame['parse']:.3e}, "
+                          f"evaluation {frame['evaluation']:.3e} seconds")
+    return records
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIRECTORY, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def history_entry(records: list[dict], label: Optional[str], size_class: str, repeats: int) -> dict:
+    return {'label': label, 'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': current_commit(),
+            'size_class': size_class, 'repeats': repeats, 'records': records}
+
+
+def append_history(entry: dict, history_file: str = HISTORY_FILE) -> None:
+    """Appends a run to the history file, which has a JSON object per line."""
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def read_history(history_file: str = HISTORY_FILE) -> list[dict]:
+    with open(history_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 0.25, min_time: float = 1e-3) -> pd.DataFrame:
+    """Compares the median times of two runs per family, size, formula and phase.
+
+    Args:
+        baseline (dict): history entry of the baseline
+        candidate (dict): history entry of the new run
+        threshold (float, optional): relative slowdown that counts as a regression. Defaults to
+        0.25.
+        min_time (float, optional): slowdowns of fewer seconds are ignored as noise. Defaults to
+        1e-3.
+
+    Returns:
+        pd.DataFrame: the measurements both runs have, with the baseline and candidate times,
+        their ratio and whether it is a regression
+    """
+    def medians(entry: dict) -> pd.DataFrame:
+        return pd.DataFrame(entry['records']).groupby(KEY, as_index=False)['time'].median()
+
+    frame = medians(baseline).merge(medians(candidate), on=KEY, suffixes=('_baseline', '_candidate'))
+    frame['ratio'] = frame['time_candidate'] / frame['time_baseline'].where(frame['time_baseline'] > 0)
+    frame['regression'] = ((frame['time_candidate'] > frame['time_baseline'] * (1 + threshold)) &
+                           (frame['time_candidate'] - frame['time_baseline'] > min_time))
+    return frame
+
+
+def parse(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='PDL model checker benchmark suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the suite and append the results to the history file')
+    run_parser.add_argument('--families', nargs='+', choices=list(GENERATORS), default=list(GENERATORS), help='Model families (default: all)')
+    run_parser.add_argument('--sizes', choices=list(SIZES), default='small', help='Size class of the models (default: small)')
+    run_parser.add_argument('--repeats', type=int, default=3, help='Number of runs per model (default: 3)')
+    run_parser.add_argument('--label', type=str, help='Name of the run in the history file')
+    run_parser.add_argument('--history', type=str, default=HISTORY_FILE, help='History file (default: benchmarks/history.jsonl)')
+    run_parser.add_argument('--save-baseline', metavar='BASELINE', nargs='?', const=BASELINE_FILE, help='Also store the run as the baseline (default file: benchmarks/baseline.json)')
+
+    compare_parser = commands.add_parser('compare', help='Flag regressions of a run in the history file against the baseline')
+    compare_parser.add_argument('--history', type=str, default=HISTORY_FILE, help='History file (default: benchmarks/history.jsonl)')
+    compare_parser.add_argument('--baseline', type=str, default=BASELINE_FILE, help='Baseline file (default: benchmarks/baseline.json)')
+    compare_parser.add_argument('--run', type=int, default=-1, help='Index of the run in the history file (default: -1, the latest)')
+    compare_parser.add_argument('--threshold', type=float, default=0.25, help='Relative slowdown that is a regression (default: 0.25)')
+    compare_parser.add_argument('--min-time', type=float, default=1e-3, help='Slowdowns below this many seconds are ignored (default: 0.001)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse(argv)
+    if args.command == 'run':
+        records = run(args.families, args.sizes, args.repeats)
+        entry = history_entry(records, args.label, args.sizes, args.repeats)
+        append_history(entry, args.history)
+        print(f'Appended {len(records)} records to {args.history}')
+        if args.save_baseline:
+            with open(args.save_baseline, 'w') as f:
+                json.dump(entry, f)
+            print(f'Stored the run as baseline in {args.save_baseline}')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    candidate = read_history(args.history)[args.run]
+    frame = compare(baseline, candidate, args.threshold, args.min_time)
+    regressions = frame[frame['regression']]
+    print(f"Compared {len(frame)} measurements of run {candidate['label'] or candidate['timestamp']} "
+          f"against baseline {baseline['label'] or baseline['timestamp']}: {len(regressions)} regressions")
+    for row in regressions.itertuples():
+        formula = f' {row.formula}' if row.formula else ''
+        print(f'REGRESSION {row.family} {row.size}{formula} {row.phase}: '
+              f'{row.time_baseline:.3e} -> {row.time_candidate:.3e} seconds ({row.ratio:.2f}x)')
+    return 1 if len(regressions) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
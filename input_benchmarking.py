@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from ExplicitSymbolicModel import ExplicitSymbolicModel
+
+EDGES_PER_STATE = 4
+
+
+def write_model(file: str, num_states: int, sparse: bool, seed: int = 0) -> None:
+    """Writes a random explicit model with one proposition and one program, either with a
+    transition matrix (PROGS) or with an edge list (EDGES).
+
+    Args:
+        file (str): path of the model file
+        num_states (int): number of states
+        sparse (bool): write the program as an edge list instead of a matrix
+        seed (int, optional): seed of the random generator. Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    sources = np.repeat(np.arange(num_states), EDGES_PER_STATE)
+    targets = rng.integers(0, num_states, size=sources.size)
+
+    with open(file, 'w') as f:
+        f.write(f'STATES\n{num_states}\n\nPROPS\np\n')
+        f.write(' '.join(map(str, rng.integers(0, 2, size=num_states))) + '\n\n')
+        if sparse:
+            f.write('EDGES\na\n')
+            np.savetxt(f, np.column_stack((sources, targets)), fmt='%d')
+        else:
+            f.write('PROGS\na\n')
+            matrix = np.zeros((num_states, num_states), dtype=np.int8)
+            matrix[sources, targets] = 1
+            np.savetxt(f, matrix, fmt='%d')
+        f.write('\nTESTS\n<a>p\n')
+
+
+def time_load(file: str) -> tuple[float, int]:
+    """Loads a model file and measures the time it takes and the peak memory used by Python.
+
+    Args:
+        file (str): path of the model file
+
+    Returns:
+        tuple[float, int]: load time in seconds and peak memory in bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = ExplicitSymbolicModel.from_file(file)
+    run_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del model
+    return run_time, peak
+
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for num_states, sparse in [(10**4, False), (10**4, True), (10**5, True), (10**6, True)]:
+            file = os.path.join(directory, 'model.txt')
+            write_model(file, num_states, sparse)
+            run_time, peak = time_load(file)
+            method = 'sparse' if sparse else 'dense'
+            print(f'num_states: {num_states}, method: {method}, run_time: {run_time:.3e}, peak_memory: {peak / 2**20:.1f} MiB')
+            results.append({'num_states': num_states, 'method': method, 'run_time': run_time, 'peak_memory': peak})
+
+    df = pd.DataFrame(results)
+    df.to_csv('input_results.csv', index=False)
+
+
+if __name__ == '__main__':
+    main()
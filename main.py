@@ -1,8 +1,30 @@
 from ExplicitSymbolicModel import ExplicitSymbolicModel
 from SymbolicModel import SymbolicModel
+from Parser import STAR_STRATEGIES
+from VariableRegistry import VARIABLE_ORDERS
+from Reordering import REORDERING_PROFILES
+from Backend import BACKENDS
+from PartitionedProgram import CLUSTER_NODES
+from BatchChecker import BatchChecker
+from Profiler import Profiler
+from lark.exceptions import LarkError
 import argparse
 from time import time
 import os
+import sys
+
+def load_model(args):
+    if args.explicit:
+        model = ExplicitSymbolicModel.from_file(args.file, args.order, args.reordering, reordering_options(args),
+                                                args.cluster_nodes)
+    else:
+        model = SymbolicModel.from_file(args.file, args.snapshot, args.snapshot_closures, args.order,
+                                        args.reordering, reordering_options(args), args.backend, args.workers,
+                                        args.reachable, args.cluster_nodes)
+        model.cone_of_influence = args.cone_of_influence
+
+    model.transformer.star_strategy = args.star
+    return model
 
 def generate_model(args):
     if args.file:
@@ -13,16 +35,13 @@ def generate_model(args):
             print('File does not exist or wrong input')
 
         t0 = time()
-
-        if args.explicit:
-            model = ExplicitSymbolicModel.from_file(args.file)
-        else:
-            model = SymbolicModel.from_file(args.file)
-
+        model = load_model(args)
         t1 = time()
         print(f'Model from {args.file} created in {t1-t0:.3e} seconds')
         print(f'Available propositions: {model.prop_names_listed()}')
         print(f'Available programs: {model.program_names_listed()}')
+        if args.reachable:
+            output_reachability(model.reachability)
         return model
     
     
@@ -119,12 +138,51 @@ def output_vector(test, model):
         print('no value error')
 
 
+def output_witness(test, model, args):
+    try:
+        t0 = time()
+        witness = model.witness(test, args.state)
+        t1 = time()
+        if witness is None:
+            holds = 'holds' if test.lstrip().startswith('[') else 'fails'
+            where = f'in state {args.state}' if args.state else 'in every state'
+            print(f'Test: {test}\nNo witness or counterexample, the formula {holds} {where}')
+        else:
+            print(witness)
+        print(f'Time: {t1-t0:.3e}\n')
+    except ValueError as e:
+        print(f'Unable to find a path for {test}: {e}\n')
+
+
+def output_batch(tests, model, args):
+    checker = BatchChecker(args, args.jobs, args.timeout, args.worker_memory)
+    try:
+        for test, outcome in checker.run(model, tests):
+            print(f'Test: {test}')
+            if outcome['status'] != 'done':
+                print(f"Unable to test {test} ({outcome['status']}): {outcome['error']}")
+            elif outcome['kind'] == 'file':
+                print(f"Result exported to {outcome['result']}")
+            else:
+                if outcome['kind'] == 'state':
+                    print(f'In state: {args.state}')
+                print(f"Result: {outcome['result']}")
+            print(f"Time: {outcome['time']:.3e}\n")
+    except RuntimeError as e:
+        print(f'Unable to finish the tests: {e}')
+        sys.exit(1)
+
+
 def output(tests, model, args):
     if tests is None:
         check_formula_interactive(model, args)
+    elif args.jobs > 1:
+        output_batch(tests, model, args)
     else:
         for test in tests:
-            if args.explicit:
+            if args.witness:
+                output_witness(test, model, args)
+            elif args.explicit:
                 output_vector(test, model)
             elif args.state:
                 output_specific_state(test, model, args)
@@ -166,6 +224,60 @@ def check_formula_interactive(model, args)-> None:
                 print('State not found in model')
 
 
+def reordering_options(args: argparse.Namespace) -> dict:
+    options = {'threshold': args.reordering_threshold, 'max_growth': args.max_growth}
+    return {key: value for key, value in options.items() if value is not None}
+
+def output_reordering_log(model) -> None:
+    for entry in model.reordering.log:
+        if entry['event'] == 'reorder':
+            print(f"Reordering ({entry['reason']}): {entry['nodes_before']} -> {entry['nodes_after']} nodes in {entry['time']:.3e} seconds")
+        else:
+            print(f"Check {entry['formula']}: {entry['reorderings']} reorderings in {entry['reordering_time']:.3e} seconds, "
+                  f"{entry['nodes_before']} -> {entry['nodes_after']} nodes")
+
+def output_reachability(report: dict) -> None:
+    print(f"Restricted to the reachable states in {report['time']:.3e} seconds ({report['rounds']} rounds): "
+          f"{report['states_before']:.0f} -> {report['states_after']:.0f} states, "
+          f"law {report['law_nodes_before']} -> {report['law_nodes_after']} nodes, "
+          f"programs {report['program_nodes_before']} -> {report['program_nodes_after']} nodes")
+
+def test_propositions(model, tests: list[str]) -> set[str]:
+    propositions = set()
+    for test in tests:
+        try:
+            propositions |= model.transformer.compile(test).propositions
+        except LarkError:
+            # reported when the test is checked
+            continue
+    return propositions & model.registry.unprimed_variables
+
+def minimize_model(model, args, tests):
+    quotient = model.minimize(args.minimize or test_propositions(model, tests))
+    report = quotient.report
+    print(f"Minimized over {', '.join(report['observables'])} in {report['time']:.3e} seconds ({report['rounds']} rounds): "
+          f"{report['states']:.0f} states -> {report['blocks']:.0f} blocks ({report['ratio']:.2f}x), "
+          f"law {report['law_nodes_before']} -> {report['law_nodes_after']} nodes, "
+          f"programs {report['program_nodes_before']} -> {report['program_nodes_after']} nodes")
+    return quotient
+
+def output_profile(profiler: Profiler, trace_file: str) -> None:
+    profiler.detach()
+    print(profiler.report())
+    profiler.write_trace(trace_file)
+    print(f'Profile trace written to {trace_file}')
+
+def variable_order(value: str):
+    if value in VARIABLE_ORDERS:
+        return value
+    return value.split(',')
+
+def memory_size(value: str) -> int:
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    if value[-1:].upper() in units:
+        return int(float(value[:-1]) * units[value[-1].upper()])
+    return int(value)
+
 def parse():
     parser = argparse.ArgumentParser(description="PDL Model Checker")
 
@@ -182,6 +294,42 @@ def parse():
 
     flag_group.add_argument("--formula", type=str, help="Evaluate a single formula and exit")
 
+    flag_group.add_argument("--star", choices=STAR_STRATEGIES, default='auto', help="Fixpoint strategy for the Kleene star (default: auto)")
+
+    flag_group.add_argument("--order", type=variable_order, default='interleaved', help=f"Variable order: one of {', '.join(VARIABLE_ORDERS)} or a comma separated list of propositions (default: interleaved)")
+
+    flag_group.add_argument("--reordering", choices=REORDERING_PROFILES, help="Dynamic reordering profile (default: keep the setting of the BDD manager)")
+
+    flag_group.add_argument("--reordering-threshold", type=int, help="Number of live nodes that triggers a reordering with the threshold profile")
+
+    flag_group.add_argument("--max-growth", type=float, help="Factor by which the BDD may grow while a variable is sifted")
+
+    flag_group.add_argument("--snapshot", metavar='SNAPSHOT', type=str, help="Load the symbolic model from this snapshot if it matches the input file, otherwise write it")
+
+    flag_group.add_argument("--snapshot-closures", metavar='PROGRAM', nargs='+', default=[], help="Programs whose closure is stored in a new snapshot")
+
+    flag_group.add_argument("--cluster-nodes", type=int, default=CLUSTER_NODES, help=f"Maximum number of nodes of a cluster of transitions of a program, 0 for a cluster per transition (default: {CLUSTER_NODES})")
+
+    flag_group.add_argument("--reachable", action='store_true', help="Restrict the model to the states reachable from the INIT section before checking")
+
+    flag_group.add_argument("--cone-of-influence", action='store_true', help="Check every formula on the part of the model that can influence it, reductions are reused by formulas over the same programs and propositions")
+
+    flag_group.add_argument("--minimize", metavar='PROPOSITION', nargs='*', help="Check the tests on the quotient of the model by its coarsest bisimulation over the given propositions (default: the propositions of the tests), the tests may only use these propositions")
+
+    flag_group.add_argument("--backend", choices=BACKENDS, default='cudd', help="BDD package for symbolic input files (default: cudd)")
+
+    flag_group.add_argument("--workers", type=int, help="Number of cores used by the sylvan backend (default: all cores)")
+
+    flag_group.add_argument("--witness", action='store_true', help="Print a shortest witness of every <program>formula test and a counterexample of every [program]formula test, starting in --state if given")
+
+    flag_group.add_argument("--profile", metavar='TRACE_FILE', nargs='?', const='profile.json', help="Time every operator and helper of the checks, print a breakdown per formula and write a Chrome trace (default file: profile.json)")
+
+    flag_group.add_argument("--jobs", type=int, default=1, help="Number of worker processes that check the tests in parallel (default: 1)")
+
+    flag_group.add_argument("--timeout", type=float, help="Maximum number of seconds per test when checking with --jobs")
+
+    flag_group.add_argument("--worker-memory", type=memory_size, help="Memory limit per worker process with --jobs, in bytes or with a K, M or G suffix")
+
     output_group = parser.add_mutually_exclusive_group()
     output_group.add_argument('--state', metavar='STATE VALUATION', type=str, help="Evaluate formula in a specific state, only available for models with unique states")
 
@@ -189,13 +337,45 @@ def parse():
 
     if args.T and not args.file:
         parser.error("--T can only be used with --file.")
+    if args.snapshot and args.explicit:
+        parser.error("--snapshot can only be used with symbolic input files.")
+    if args.reachable and args.explicit:
+        parser.error("--reachable can only be used with symbolic input files.")
+    if args.cone_of_influence and args.explicit:
+        parser.error("--cone-of-influence can only be used with symbolic input files.")
+    if args.minimize is not None and args.explicit:
+        parser.error("--minimize can only be used with symbolic input files.")
+    if args.minimize is not None and (args.witness or args.profile or args.jobs > 1):
+        parser.error("--minimize can only be used without --witness, --profile and --jobs.")
+    if args.minimize == [] and not (args.formula or args.T):
+        parser.error("--minimize needs propositions when the formulas are entered interactively.")
+    if args.profile and args.cone_of_influence:
+        parser.error("--profile can only be used without --cone-of-influence.")
+    if args.backend != 'cudd' and args.explicit:
+        parser.error("--backend can only be used with symbolic input files.")
+    if args.backend != 'cudd' and args.snapshot:
+        parser.error("--snapshot can only be used with the cudd backend.")
+    if args.workers is not None and args.backend != 'sylvan':
+        parser.error("--workers can only be used with the sylvan backend.")
+    if args.witness and args.jobs > 1:
+        parser.error("--witness can only be used without --jobs.")
+    if args.profile and args.jobs > 1:
+        parser.error("--profile can only be used without --jobs.")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
     return args
 
 def main():
     args = parse()
     model = generate_model(args)
     tests = find_tests(model, args)
-    output(tests, model, args)
+    checked = minimize_model(model, args, tests) if args.minimize is not None else model
+    profiler = Profiler(model).attach() if args.profile else None
+    output(tests, checked, args)
+    if profiler:
+        output_profile(profiler, args.profile)
+    if args.reordering:
+        output_reordering_log(model)
 
 
 if __name__ == "__main__":
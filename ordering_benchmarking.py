@@ -0,0 +1,55 @@
+import time
+import pandas as pd
+from benchmarking import create_symbolic_model
+from SymbolicModel import SymbolicModel
+from ExplicitSymbolicModel import ExplicitSymbolicModel
+from VariableRegistry import VARIABLE_ORDERS
+
+CHAIN_FORMULAS = ['<a*>p', '<a;a>p', '<a*;a>p']
+
+
+def measure(model, formulas: list[str]) -> dict:
+    """Checks the formulas in a model and measures the time and the size of the BDDs.
+
+    Args:
+        model (Union[SymbolicModel, ExplicitSymbolicModel]): the model
+        formulas (list[str]): PDL formulas
+
+    Returns:
+        dict: the number of nodes of the programs, the number of live nodes in the manager after
+        checking and the time it took
+    """
+    program_nodes = sum(len(program) for program in model.programs.values())
+    start_cpu = time.process_time_ns()
+    for formula in formulas:
+        model.transformer.evaluate_expression(formula)
+    run_time = (time.process_time_ns() - start_cpu) / 1e9
+    return {'program_nodes': program_nodes, 'live_nodes': len(model.bdd), 'run_time': run_time}
+
+
+def main():
+    results = []
+
+    for num_states in [100, 1000, 4000]:
+        for order in VARIABLE_ORDERS:
+            # the chain is built without dynamic reordering, so the differences come from the order
+            bdd, prop_names, law, programs = create_symbolic_model(num_states)
+            model = SymbolicModel(bdd, prop_names, law, programs, variable_order=order)
+            result = {'model': f'chain_{num_states}', 'order': order, **measure(model, CHAIN_FORMULAS)}
+            print(result)
+            results.append(result)
+
+    for file, model_class in [('example_symbolic_input.txt', SymbolicModel),
+                              ('example_matrix_input.txt', ExplicitSymbolicModel)]:
+        for order in VARIABLE_ORDERS:
+            model = model_class.from_file(file, variable_order=order)
+            result = {'model': file, 'order': order, **measure(model, model.file_tests())}
+            print(result)
+            results.append(result)
+
+    df = pd.DataFrame(results)
+    df.to_csv('ordering_results.csv', index=False)
+
+
+if __name__ == '__main__':
+    main()
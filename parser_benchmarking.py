@@ -0,0 +1,58 @@
+import time
+from lark import Lark
+from Parser import PDLTransformer
+import pandas as pd
+
+# one block contains 10 operators: <>, ;, U, *, &, !, |, [], ? and ->
+BLOCK = '<a;(b U c)*>(p & !q) | [d?]r -> '
+
+
+def generate_formula(num_operators: int) -> str:
+    """Generates a formula with (roughly) the given number of operators, by chaining blocks of 10
+    operators with implications.
+
+    Args:
+        num_operators (int): number of operators in the formula
+
+    Returns:
+        str: PDL formula
+    """
+    return BLOCK * max(num_operators // 10, 1) + 'p'
+
+
+def time_parse(parser: Lark, formula: str, runs: int) -> float:
+    start_cpu = time.process_time_ns()
+    for _ in range(runs):
+        parser.parse(formula)
+    return (time.process_time_ns() - start_cpu) / runs / 1e9
+
+
+def main():
+    results = []
+
+    start_cpu = time.process_time_ns()
+    earley = Lark(PDLTransformer.grammar, parser='earley', lexer='basic')
+    print(f'Earley grammar compiled in {(time.process_time_ns() - start_cpu) / 1e9:.3e} seconds')
+
+    start_cpu = time.process_time_ns()
+    lalr = PDLTransformer.get_parser()
+    print(f'LALR grammar compiled (or loaded from cache) in {(time.process_time_ns() - start_cpu) / 1e9:.3e} seconds')
+
+    for num_operators in [10, 100, 1000, 10000]:
+        formula = generate_formula(num_operators)
+        runs = max(1, 1000 // num_operators)
+
+        for method, parser in [('lalr', lalr), ('earley', earley)]:
+            # Earley needs minutes for the largest formulas
+            if method == 'earley' and num_operators > 1000:
+                continue
+            run_time = time_parse(parser, formula, runs)
+            print(f'num_operators: {num_operators}, method: {method}, run_time: {run_time:.3e}')
+            results.append({'num_operators': num_operators, 'method': method, 'run_time': run_time})
+
+    df = pd.DataFrame(results)
+    df.to_csv('parser_results.csv', index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from BinaryModel import convert, read_binary_model
+from ExplicitSymbolicModel import ExplicitSymbolicModel
+from MatrixInputToModel import SymbolicModelFromMatrix
+
+# 11 states (not a multiple of 8, so the packed valuation rows are padded) with distinct
+# valuations, and an empty program in both notations
+NUM_STATES = 11
+VALUATIONS = [[(state >> bit) & 1 for state in range(NUM_STATES)] for bit in range(4)]
+PROPOSITIONS = ['p', 'q', 'r', 's']
+EDGES = {
+    'a': [(0, 1), (1, 2), (2, 2), (3, 0), (7, 10), (10, 3)],
+    'b': [(0, 0), (1, 4), (4, 5), (5, 6), (6, 4), (9, 8), (10, 10), (10, 0)],
+    'c': [],
+}
+TESTS = ['<a>p', '[a]q', '<a ; b>r', '<a U b>s', '<a*>(p & q)', '<p?>r', '<c>p', '[c]!p', '<(a U c)*>s']
+
+
+def model_header() -> str:
+    lines = ['STATES', str(NUM_STATES), '', 'PROPS']
+    for name, valuation in zip(PROPOSITIONS, VALUATIONS):
+        lines += [name, ' '.join(map(str, valuation)), '']
+    return '\n'.join(lines) + '\n'
+
+
+def model_footer() -> str:
+    return 'TESTS\n' + '\n'.join(TESTS) + '\n'
+
+
+def dense_model() -> str:
+    text = model_header() + 'PROGS\n'
+    for name, edges in EDGES.items():
+        matrix = np.zeros((NUM_STATES, NUM_STATES), dtype=int)
+        for source, target in edges:
+            matrix[source, target] = 1
+        text += name + '\n' + '\n'.join(' '.join(map(str, row)) for row in matrix) + '\n\n'
+    return text + model_footer()
+
+
+def sparse_model() -> str:
+    text = model_header() + 'EDGES\n'
+    for name, edges in EDGES.items():
+        text += name + '\n' + ''.join(f'{source} {target}\n' for source, target in edges) + '\n'
+    return text + model_footer()
+
+
+def edge_set(program) -> set[tuple[int, int]]:
+    """The transitions of a program as given to ExplicitSymbolicModel."""
+    if isinstance(program, tuple):
+        program = [program]
+    return {(int(source), int(target)) for sources, targets in program for source, target in zip(sources, targets)}
+
+
+def model_edges(model: ExplicitSymbolicModel, program_name: str) -> set[tuple[int, int]]:
+    """The transitions of a program of a model, found by testing every pair of states."""
+    relation = model.programs[program_name].relation(model.registry.variables)
+    return {(source, target) for source in range(NUM_STATES) for target in range(NUM_STATES)
+            if model._edge(source, target) & relation != model.bdd.false}
+
+
+@pytest.fixture(params=[dense_model, sparse_model], ids=['dense', 'sparse'])
+def model_files(request, tmp_path):
+    text_file = tmp_path / 'model.txt'
+    text_file.write_text(request.param())
+    binary_file = tmp_path / 'model.pdlm'
+    convert(str(text_file), str(binary_file))
+    return str(text_file), str(binary_file)
+
+
+def test_binary_model_is_memory_mapped(model_files):
+    _, binary_file = model_files
+    _, _, _, programs, program_names, _ = read_binary_model(binary_file)
+    for program, name in zip(programs, program_names):
+        if EDGES[name]:
+            assert isinstance(program.indices, np.memmap)
+        assert len(program.indptr) == NUM_STATES + 1
+
+
+def test_round_trip_preserves_contents(model_files):
+    text_file, binary_file = model_files
+    num_states, valuations, proposition_names, programs, program_names, tests = SymbolicModelFromMatrix(text_file)
+    binary_model = ExplicitSymbolicModel.from_file(binary_file)
+
+    assert binary_model._num_states == num_states == NUM_STATES
+    assert binary_model.prop_names == proposition_names == PROPOSITIONS
+    assert list(binary_model.programs) == program_names == list(EDGES)
+    assert binary_model.tests == tests == TESTS
+    np.testing.assert_array_equal(binary_model._valuation_matrix.T, np.asarray(valuations, dtype=bool))
+    np.testing.assert_array_equal(binary_model._valuation_matrix.T, np.asarray(VALUATIONS, dtype=bool))
+    for program, name in zip(programs, program_names):
+        assert model_edges(binary_model, name) == edge_set(program) == set(EDGES[name])
+
+
+def test_round_trip_preserves_results(model_files):
+    text_file, binary_file = model_files
+    text_model = ExplicitSymbolicModel.from_file(text_file)
+    binary_model = ExplicitSymbolicModel.from_file(binary_file)
+    for test in TESTS:
+        np.testing.assert_array_equal(binary_model.check(test), text_model.check(test), err_msg=test)
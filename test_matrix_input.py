@@ -0,0 +1,44 @@
+import numpy as np
+
+from ExplicitSymbolicModel import ExplicitSymbolicModel
+from MatrixInputToModel import SymbolicModelFromMatrix
+
+EDGES = {'a': [(0, 1), (1, 1), (2, 0)], 'b': [(1, 2), (2, 0)]}
+
+
+def write_model(directory, edge_files: dict[str, str]) -> str:
+    """Writes a model whose programs are in separate edge list files, named in edge_files."""
+    directory.mkdir(exist_ok=True)
+    for name, edges in EDGES.items():
+        (directory / f'{name}_edges.txt').write_text(''.join(f'{source} {target}\n' for source, target in edges))
+    programs = ''.join(f'{name} {edge_file}\n' for name, edge_file in edge_files.items())
+    model = directory / 'model.txt'
+    model.write_text(f'STATES\n3\n\nPROPS\np\n1 1 0\n\nq\n0 1 1\n\nEDGES\n{programs}\nTESTS\n<a>p\n<a ; b>q\n')
+    return str(model)
+
+
+def edge_set(chunks) -> set[tuple[int, int]]:
+    return {(int(source), int(target)) for sources, targets in chunks for source, target in zip(sources, targets)}
+
+
+def test_edge_files_are_relative_to_the_model(tmp_path, monkeypatch):
+    write_model(tmp_path / 'ext', {name: f'{name}_edges.txt' for name in EDGES})
+    monkeypatch.chdir(tmp_path)
+
+    _, _, _, programs, program_names, _ = SymbolicModelFromMatrix('ext/model.txt')
+    assert {name: edge_set(program) for name, program in zip(program_names, programs)} == \
+        {name: set(edges) for name, edges in EDGES.items()}
+
+    explicit = ExplicitSymbolicModel.from_file('ext/model.txt')
+    np.testing.assert_array_equal(explicit.check('<a>p'), [1, 1, 1])
+    np.testing.assert_array_equal(explicit.check('<a ; b>q'), [1, 1, 0])
+
+
+def test_absolute_edge_files(tmp_path, monkeypatch):
+    directory = tmp_path / 'ext'
+    write_model(directory, {name: str(directory / f'{name}_edges.txt') for name in EDGES})
+    monkeypatch.chdir(tmp_path)
+
+    _, _, _, programs, program_names, _ = SymbolicModelFromMatrix('ext/model.txt')
+    assert {name: edge_set(program) for name, program in zip(program_names, programs)} == \
+        {name: set(edges) for name, edges in EDGES.items()}